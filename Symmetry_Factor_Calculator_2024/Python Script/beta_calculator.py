@@ -16,11 +16,16 @@ Relevant Paper:
 Email: ajwongphd@gmail.com
 """
 
+import os
+import sys
 import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
 import pickle
 from scipy.interpolate import interp1d
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from agcdft import beta_average, beta_coefficients
 plt.style.use('seaborn')
 colors = sns.color_palette('deep', n_colors=8)
 
@@ -49,24 +54,13 @@ u=np.linspace(-1,1,50)
 polar = np.array([i - polar_in for i in polar_fin])
 dm = np.array([i - dm_bare for i in dm_fin])
 a_dm= np.array([dm_fin[0] * y - dm_bare*polar_in for y in polar])
-u_prime =np.array( [i-u_pzc for i in u])
-
-#Beta varies with dm
-beta_avg_dm = []  # Create a list to store separate lists of beta_avg
 
 desired_index_dm = 0 # index of dm
 desired_index_a = 1 # index of polar and a_dm
 
-#Beta is calculated based on non-faradaic step 
-for index in range(len(polar)):
-    beta_avg = []  # Create a new list for each dm value
-    for i in d: #polar and a_dm
-        a_beta = polar[desired_index_a] / (i ** 2)
-        b_beta = 2 * dm[desired_index_dm] / i - (a_dm[desired_index_a] / (e_r[index] * e_vac* A * i ** 2))
-        beta = b_beta + a_beta * u_prime
-        beta_avg_i = sum(beta) / len(beta)
-        beta_avg.append(beta_avg_i)
-    beta_avg_dm.append(beta_avg)  # Append the beta_avg list to beta_avg_lists
+#Beta is calculated based on non-faradaic step, averaged over u in closed form for every e_r and d
+beta_coeffs = beta_coefficients(dm[desired_index_dm], polar[desired_index_a], a_dm[desired_index_a], e_r, d, A, faradaic=False)
+beta_avg_dm = beta_average(beta_coeffs, u[0], u[-1], u_pzc)[0] # rows are e_r, columns are d
 
 fig,ax = plt.subplots(figsize=(12,10))
 #ax2=ax.twinx()
@@ -132,21 +126,10 @@ u=np.linspace(-2,1,50)
 polar = np.array([i - polar_in for i in polar_fin])
 dm = np.array([i - dm_bare for i in dm_fin])
 a_dm= np.array([x * y - dm_bare*polar_in for x,y in zip(polar_fin,dm_fin)])
-u_prime =np.array( [i-u_pzc for i in u])
-
-#Beta varies with dm
-beta_avg_dm = []  # Create a list to store separate lists of beta_avg
-
-#Beta is calculated based on non-faradaic step 
-for dm_index in range(len(dm)):
-    beta_avg = []  # Create a new list for each dm value
-    for i in d:
-        a_beta = polar[0] / (i ** 2)
-        b_beta = 2 * dm[dm_index] / i - (a_dm[0] / (e_r[0] * e_vac* A * i ** 2))
-        beta = b_beta + a_beta * u_prime
-        beta_avg_i = sum(beta) / len(beta)
-        beta_avg.append(beta_avg_i)
-    beta_avg_dm.append(beta_avg)  # Append the beta_avg list to beta_avg_lists
+
+#Beta varies with dm, calculated based on non-faradaic step and averaged over u in closed form
+beta_coeffs = beta_coefficients(dm, polar[0], a_dm[0], e_r, d, A, faradaic=False)
+beta_avg_dm = beta_average(beta_coeffs, u[0], u[-1], u_pzc)[:, 0] # rows are dm, columns are d
 
 fig,ax = plt.subplots(figsize=(12,10))
 #ax2=ax.twinx()
@@ -211,21 +194,10 @@ u=np.linspace(-2,1,50)
 polar = np.array([i - polar_in for i in polar_fin])
 dm = np.array([i - dm_bare for i in dm_fin])
 a_dm= np.array([dm_fin[0] * y - dm_bare*polar_in for y in polar])
-u_prime =np.array( [i-u_pzc for i in u])
-
-#Beta varies with dm
-beta_avg_dm = []  # Create a list to store separate lists of beta_avg
-
-#Beta is calculated based on non-faradaic step 
-for dm_index in range(len(polar)):
-    beta_avg = []  # Create a new list for each dm value
-    for i in d:
-        a_beta = polar[dm_index] / (i ** 2)
-        b_beta = 2 * dm[0] / i - (a_dm[dm_index] / (e_r[0] * e_vac* A * i ** 2))
-        beta = b_beta + a_beta * u_prime
-        beta_avg_i = sum(beta) / len(beta)
-        beta_avg.append(beta_avg_i)
-    beta_avg_dm.append(beta_avg)  # Append the beta_avg list to beta_avg_lists
+
+#Beta varies with polar, calculated based on non-faradaic step and averaged over u in closed form
+beta_coeffs = beta_coefficients(dm[0], polar, a_dm, e_r, d, A, faradaic=False)
+beta_avg_dm = beta_average(beta_coeffs, u[0], u[-1], u_pzc)[:, 0] # rows are polar, columns are d
 
 fig,ax = plt.subplots(figsize=(12,10))
 #ax2=ax.twinx()
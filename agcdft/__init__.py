@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+agcdft: shared analytical GC-DFT routines for the calculators in this repository
+
+Usage of the analytical GC-DFT framework requires citation of:
+1. https://doi.org/10.1016/j.jcat.2024.115360
+"""
+
+from .beta import beta_average, beta_coefficients, beta_crossing, beta_profile
+from .cache import ResultCache, row_hashes
+from .dataset import kernel_inputs, load_reactions
+from .edl_models import EDLModel, GouyChapmanStern, Helmholtz, TabulatedCapacitance, edl_model_from_spec
+from .inverse import beta_to_tafel, er_curve, fit_beta_line, fit_edl, tafel_to_beta
+from .kernel import (AXES, E_VAC, FLOAT32_ERROR, K_B, MODEL_VERSION, Workspace, edl_polynomials, edl_terms, edl_terms_into,
+                     grid_axis, reaction_axis, reaction_deltas)
+from .kinetics import KINETIC_TERMS, kinetics, kinetics_dataset, log_current, log_rate_constants, tafel_slopes
+from .mechanism import Mechanism, load_mechanism
+from .microkinetics import microkinetics, rate_control, rate_network, steady_state
+from .onset import onset_dataset, onset_potentials, quadratic_roots
+from .profiling import profiled, stage
+from .results import RESULT_AXES, EDLResult
+from .sobol import SOBOL_PARAMETERS, sobol_dataset, sobol_indices
+from .stream import REDUCTIONS, open_stream, stream_dataset, stream_sweep
+from .sweep import TERMS, incremental_sweep, run_sweep, sweep_dataset
+from .uncertainty import StreamingStats, propagate_dataset, propagate_uncertainty
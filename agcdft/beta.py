@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Analytical symmetry factor (beta) from the Model 2C expansion
+
+beta is the derivative of G_2C with respect to U' and is linear in U':
+
+    beta(U') = b_beta + 2 * a_beta * U'
+    b_beta   = f + 2*diff_dm/d - diff_a_dm/(er*e_vac*a*d^2)    (f = 1 faradaic, 0 chemical)
+    a_beta   = diff_polar/(2*d^2)
+
+so the average over a potential window and the potential where beta crosses
+a given value (usually 0.5) are closed form and need no potential grid.
+
+The grid layout follows agcdft.kernel: per-reaction inputs run along axis 0,
+dielectric constants along axis 1, EDL widths along axis 2 and potentials
+along axis 3.
+
+Reference: (JACS paper) and https://doi.org/10.1016/j.jcat.2024.115360
+"""
+
+import numpy as np
+
+from .kernel import E_VAC, grid_axis, reaction_axis
+from .profiling import profiled
+
+
+@profiled('post')
+def beta_coefficients(diff_dm, diff_polar, diff_a_dm, er, d, area, faradaic=True, e_vac=E_VAC):
+    """
+    Intercept and half-slope of beta(U') on the (reaction, er, d) grid.
+
+    Parameters
+    ----------
+    diff_dm, diff_polar, diff_a_dm : array_like, shape (R,)
+        Dipole moment change (eA), polarizability change (eA^2V^-1) and
+        change of polarizability times dipole moment along the path.
+    er, d : array_like, shapes (E,) and (D,)
+        Relative permittivities and Helmholtz EDL widths (A).
+    area : array_like, shape (R,) or scalar
+        Surface area (A^2).
+    faradaic : bool or array_like of bool, shape (R,)
+        beta builds from 1 for faradaic steps and from 0 for chemical steps.
+
+    Returns
+    -------
+    dict
+        'b_beta' and 'a_beta', both of shape (R, E, D).
+    """
+    n = np.broadcast(*(np.atleast_1d(x) for x in (diff_dm, diff_polar, diff_a_dm, area, faradaic))).size
+    shape = (n, np.size(er), np.size(d))
+    f = reaction_axis(np.broadcast_to(np.asarray(faradaic, dtype=float), (n,)), 3)
+    a = reaction_axis(np.broadcast_to(np.asarray(area, dtype=float), (n,)), 3)
+    e = grid_axis(er, 1, 3) * e_vac #complex permittivity
+    d = grid_axis(d, 2, 3)
+
+    b_beta = (f + 2 * reaction_axis(np.broadcast_to(diff_dm, (n,)), 3) / d
+              - reaction_axis(np.broadcast_to(diff_a_dm, (n,)), 3) / (e * a * d ** 2))
+    a_beta = reaction_axis(np.broadcast_to(diff_polar, (n,)), 3) / (2 * d ** 2)
+    return {'b_beta': np.broadcast_to(b_beta, shape), 'a_beta': np.broadcast_to(a_beta, shape)}
+
+
+@profiled('post')
+def beta_profile(coeffs, u, u_pzc=0.0):
+    """beta(U') on the (reaction, er, d, U) grid for potentials u (V-SHE)."""
+    u_prime = np.atleast_1d(np.asarray(u, dtype=float)) - reaction_axis(u_pzc)
+    return coeffs['b_beta'][..., None] + 2 * coeffs['a_beta'][..., None] * u_prime
+
+
+@profiled('post')
+def beta_average(coeffs, u_low, u_high, u_pzc=0.0):
+    """
+    Average of beta over the window [u_low, u_high] (V-SHE), shape (R, E, D).
+
+    beta is linear in U', so its average is beta at the window midpoint. This
+    equals the mean over any evenly spaced grid spanning the window.
+    """
+    u_mid = 0.5 * (u_low + u_high) - reaction_axis(u_pzc, 3)
+    return coeffs['b_beta'] + 2 * coeffs['a_beta'] * u_mid
+
+
+@profiled('post')
+def beta_crossing(coeffs, level=0.5, u_pzc=0.0, reference='pzc'):
+    """
+    Potential at which beta equals ``level``, shape (R, E, D).
+
+    Returned as U' for reference='pzc' or as U (V-SHE) for reference='she'.
+    Entries where beta does not depend on potential (diff_polar = 0) are NaN.
+    """
+    if reference not in ('pzc', 'she'):
+        raise ValueError("reference must be 'pzc' or 'she', got %r" % (reference,))
+    slope = 2 * coeffs['a_beta']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u_cross = np.where(slope != 0, (level - coeffs['b_beta']) / slope, np.nan)
+    if reference == 'she':
+        u_cross = u_cross + reaction_axis(u_pzc, 3)
+    return u_cross
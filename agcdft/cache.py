@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed on-disk cache of sweep results, one .npy file per reaction row
+
+Every row of a sweep is stored under the SHA-256 of
+
+    MODEL_VERSION | er, d and U grids | terms | e_vac | dtype | EDL model | the row's kernel inputs
+
+so a row is invalidated exactly when one of its own inputs, the grid, the
+requested terms, the precision, the EDL model or the kernel version changes;
+editing one reaction of a sheet recomputes only that reaction. Hits are
+opened with np.load(mmap_mode='r') and copied into the sweep result
+straight from the page cache.
+
+The cache folder is bounded in size: loading a row refreshes its
+modification time, and evict() deletes the least recently used rows until
+the folder fits in max_bytes ($AGCDFT_CACHE_BYTES, default 2 GB). evict()
+stats every file, so sweeps call trim() instead, which adds the bytes
+they stored to the size recorded in the folder's 'size' file and only
+scans and evicts once that estimate exceeds max_bytes. Concurrent writers
+may lose each other's updates of the estimate; the next evict() resets it
+to the measured size.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from .dataset import default_cache_dir
+from .edl_models import Helmholtz
+from .kernel import MODEL_VERSION
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+SIZE_FILE = 'size' #Estimated size of the folder in bytes
+ROW_INPUTS = ('e_in', 'e_fin', 'dm_in', 'dm_fin', 'polar_in', 'polar_fin', 'g_solv', 'area', 'u_pzc', 'faradaic')
+
+
+def _digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+def row_hashes(inputs):
+    """SHA-256 of the kernel inputs of every row (surface constants included), independent of the grid."""
+    n = np.broadcast(*(np.atleast_1d(inputs[k]) for k in ROW_INPUTS if k in inputs)).size
+    columns = [(k, np.broadcast_to(np.asarray(inputs[k], dtype=np.float64), (n,))) for k in ROW_INPUTS if k in inputs]
+    return [_digest(*(k.encode() + col[i].tobytes() for k, col in columns)) for i in range(n)]
+
+
+class ResultCache:
+    """
+    Size-bounded LRU folder of per-row sweep results.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Defaults to the 'sweeps' folder of agcdft.dataset.default_cache_dir().
+    max_bytes : int, optional
+        Size bound of the folder. Defaults to $AGCDFT_CACHE_BYTES or 2 GB.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.path = cache_dir or os.path.join(default_cache_dir(), 'sweeps')
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('AGCDFT_CACHE_BYTES', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._stored = 0 #Bytes written by store() and not yet added to the size file
+
+    def row_keys(self, inputs, er, d, u, terms, e_vac, dtype=np.float64, edl_model=None):
+        """Cache key of every row of a sweep of per-reaction kernel inputs."""
+        grid = _digest(MODEL_VERSION, *(np.ascontiguousarray(x, dtype=np.float64).tobytes() for x in (er, d, u)),
+                       ','.join(terms), repr(float(e_vac)), np.dtype(dtype).name, (edl_model or Helmholtz()).key())
+        return [_digest(grid, row) for row in row_hashes(inputs)]
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + '.npy')
+
+    def load(self, key):
+        """Memory-mapped row for key, or None on a miss."""
+        path = self._file(key)
+        try:
+            row = np.load(path, mmap_mode='r')
+            os.utime(path) #Mark as recently used
+        except (FileNotFoundError, ValueError):
+            return None
+        return row
+
+    def store(self, key, row):
+        """Write one row atomically; call evict() once a batch is stored."""
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '%s.%d.tmp.npy' % (path[:-4], os.getpid())
+        np.save(tmp, np.ascontiguousarray(row))
+        self._stored += os.path.getsize(tmp)
+        os.replace(tmp, path) #atomic, so concurrent runs never read a partial file
+
+    def discard(self, key):
+        """Drop one row from the cache."""
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """(path, size, mtime) of every cached row."""
+        out = []
+        if not os.path.isdir(self.path):
+            return out
+        for sub in os.scandir(self.path):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.npy') and not entry.name.endswith('.tmp.npy'):
+                    st = entry.stat()
+                    out.append((entry.path, st.st_size, st.st_mtime))
+        return out
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def _read_estimate(self):
+        try:
+            with open(os.path.join(self.path, SIZE_FILE)) as fh:
+                return int(fh.read())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_estimate(self, size):
+        if not os.path.isdir(self.path):
+            return
+        tmp = os.path.join(self.path, '%s.%d.tmp' % (SIZE_FILE, os.getpid()))
+        with open(tmp, 'w') as fh:
+            fh.write(str(int(size)))
+        os.replace(tmp, os.path.join(self.path, SIZE_FILE))
+
+    def estimate(self):
+        """Estimated size of the folder in bytes without scanning it."""
+        return self._read_estimate() + self._stored
+
+    def trim(self):
+        """Record the rows stored since the last call and evict() only when the estimate exceeds max_bytes."""
+        if not self._stored:
+            return 0
+        estimate = self.estimate()
+        if estimate > self.max_bytes:
+            return self.evict()
+        self._write_estimate(estimate)
+        self._stored = 0
+        return 0
+
+    def evict(self):
+        """Delete least recently used rows until the folder fits in max_bytes; returns bytes freed."""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for path, size, _ in entries:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+        self._write_estimate(total - freed)
+        self._stored = 0
+        return freed
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+        self._write_estimate(0)
+        self._stored = 0
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Headless command line entry point: python -m agcdft sweep ...
+
+Runs a reaction dataset (Excel template or CSV) over an EDL grid and writes
+the labelled result tensor, the averaged symmetry factors and optional
+figures to disk without any prompts or windows, e.g. inside a SLURM array:
+
+    python -m agcdft sweep "CO_data.xlsx" --sheet 111.py --er 1,2,4,8,13,78.4 \
+        --d 3,4.5,6,10 --u=-2.5:1:25 --chemical OC-CO --out 111.npz --beta --figures figs
+
+Grids are given as comma separated values or start:stop:num (np.linspace),
+or all three at once in a JSON file with keys er, d and u (--grid).
+matplotlib is only imported when --figures is given. --profile trace.json
+records the wall time and peak memory of every stage (agcdft.profiling).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+DEFAULT_GRID = {'er': '1,2,4,8,13,78.4', 'd': '3,4.5,6,10', 'u': '-2.5:1:25'}
+
+
+def parse_grid(spec):
+    """'1,2,4' -> [1, 2, 4] and 'start:stop:num' -> np.linspace(start, stop, num)."""
+    if isinstance(spec, (list, tuple)):
+        return np.asarray(spec, dtype=float)
+    spec = str(spec).strip()
+    if ':' in spec:
+        start, stop, num = spec.split(':')
+        return np.linspace(float(start), float(stop), int(num))
+    return np.array([float(i) for i in spec.split(',') if i.strip()])
+
+
+def _beta_output(dataset, er, d, u):
+    """Window-averaged beta and beta = 0.5 crossing (V-SHE) on the (reaction, er, d) grid."""
+    from .beta import beta_average, beta_coefficients, beta_crossing
+    from .dataset import kernel_inputs
+    from .kernel import reaction_deltas
+
+    inputs = kernel_inputs(dataset)
+    deltas = reaction_deltas(inputs['dm_in'], inputs['dm_fin'], inputs['polar_in'], inputs['polar_fin'])
+    coeffs = beta_coefficients(deltas['diff_dm'], deltas['diff_polar'], deltas['diff_a_dm'], er, d,
+                               inputs['area'], faradaic=inputs['faradaic'])
+    return {'reaction': dataset['M'], 'er': er, 'd': d,
+            'beta_avg': beta_average(coeffs, u[0], u[-1], inputs['u_pzc']),
+            'beta_cross': beta_crossing(coeffs, 0.5, inputs['u_pzc'], reference='she')}
+
+
+def _result_cache(spec):
+    """ResultCache of --cache [DIR], or None without --cache."""
+    if spec is None:
+        return None
+    from .cache import ResultCache
+    return ResultCache(None if spec is True else spec)
+
+
+def _write_results(args, dataset, er, d, u, terms, edl_model):
+    """In-memory sweep written to --out plus the optional beta, onset and figure files; returns the paths."""
+    from . import profiling
+    from .sweep import sweep_dataset
+
+    result = sweep_dataset(dataset, er, d, u, terms=terms, workers=args.workers, chunk_size=args.chunk_size,
+                           cache=_result_cache(args.cache), store=args.store, dtype=args.dtype, jit=args.jit,
+                           edl_model=edl_model)
+    result.attrs.update(dataset=os.path.abspath(args.dataset), sheet=str(args.sheet))
+
+    out_dir = os.path.dirname(os.path.abspath(args.out))
+    os.makedirs(out_dir, exist_ok=True)
+    result.to_npz(args.out)
+    written = [args.out]
+
+    if args.beta:
+        path = os.path.splitext(args.out)[0] + '_beta.npz'
+        beta = _beta_output(dataset, er, d, u)
+        with profiling.stage('save_beta', 'export'):
+            np.savez(path, **beta)
+        written.append(path)
+
+    if args.onset is not None:
+        from .onset import onset_dataset
+        path = os.path.splitext(args.out)[0] + '_onset.npz'
+        onset = onset_dataset(dataset, er, d, level=args.onset)
+        with profiling.stage('save_onset', 'export'):
+            np.savez(path, reaction=dataset['M'], er=er, d=d, level=args.onset, u=onset['u'], beta=onset['beta'])
+        written.append(path)
+
+    if args.figures:
+        from .plotting import save_figures
+        written.extend(save_figures(result, args.figures, workers=args.workers))
+    return written
+
+
+def sweep_command(args):
+    from . import profiling
+    from .dataset import load_reactions
+    from .edl_models import edl_model_from_spec
+
+    if args.profile:
+        profiling.enable()
+
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid) as fh:
+            grid.update(json.load(fh))
+    for key in ('er', 'd', 'u'):
+        if getattr(args, key) is not None:
+            grid[key] = getattr(args, key)
+    er, d, u = (parse_grid(grid[key]) for key in ('er', 'd', 'u'))
+    if args.stream:
+        ignored = [flag for flag, value in (('--out', args.out), ('--figures', args.figures), ('--store', args.store),
+                                            ('--cache', args.cache), ('--beta', args.beta)) if value]
+        if ignored:
+            args.parser.error('--stream writes only its folder (beta_avg.npy in place of --beta) and cannot be '
+                              'combined with %s' % ', '.join(ignored))
+    if args.store and args.cache:
+        args.parser.error('--store keeps its own result tensor and cannot be combined with --cache')
+    edl_model = edl_model_from_spec(args.edl)
+    if not edl_model.polynomial and (args.beta or args.onset is not None):
+        raise SystemExit('--beta and --onset use the closed forms of the Helmholtz model, not --edl %s' % args.edl)
+
+    dataset = load_reactions(args.dataset, args.sheet, use_cache=not args.no_cache)
+    if args.chemical:
+        chemical = {m.strip() for m in args.chemical.split(',')}
+        unknown = sorted(chemical - set(dataset['M']))
+        if unknown:
+            raise SystemExit('unknown reaction(s) in --chemical: %s (the sheet has %s)'
+                             % (', '.join(unknown), ', '.join(map(str, dataset['M']))))
+        dataset['Faradaic'] = np.array([m not in chemical for m in dataset['M']])
+
+    terms = tuple(t.strip() for t in args.terms.split(','))
+    if args.stream:
+        from .stream import DEFAULT_CHUNK_POINTS, stream_dataset
+        chunk_points = args.chunk_size * er.size * d.size * u.size if args.chunk_size else DEFAULT_CHUNK_POINTS
+        stream_dataset(dataset, er, d, u, args.stream, terms=terms, workers=args.workers, dtype=args.dtype, jit=args.jit,
+                       edl_model=edl_model, level=args.onset if args.onset is not None else 0.0,
+                       chunk_points=chunk_points)
+        written = [args.stream]
+    else:
+        args.out = args.out or 'results.npz'
+        written = _write_results(args, dataset, er, d, u, terms, edl_model)
+
+    if args.profile:
+        written.append(profiling.write_trace(args.profile))
+    if not args.quiet:
+        for path in written:
+            print(path)
+        if args.profile:
+            profiling.report()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m agcdft',
+                                     description='Analytical GC-DFT calculators without GUI or prompts')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sweep = sub.add_parser('sweep', help='evaluate a reaction dataset over an (er, d, U) grid')
+    sweep.add_argument('dataset', help='Excel workbook or CSV following the reaction template')
+    sweep.add_argument('--sheet', default=None, help='sheet name, e.g. 111.py (default: first sheet)')
+    sweep.add_argument('--grid', help='JSON file with er, d and u grid specs')
+    sweep.add_argument('--er', help='dielectric constants, e.g. 1,2,78.4 or 1:80:20 (default %s)' % DEFAULT_GRID['er'])
+    sweep.add_argument('--d', help='EDL widths in A (default %s)' % DEFAULT_GRID['d'])
+    sweep.add_argument('--u', help='potentials in V-SHE (default %s); use --u=-2.5:1:25' % DEFAULT_GRID['u'])
+    sweep.add_argument('--terms', default='g_2c', help='comma separated terms to keep (default g_2c)')
+    sweep.add_argument('--chemical', help='comma separated reaction names that are chemical (non-faradaic) steps')
+    sweep.add_argument('--out', help='result file (default results.npz)')
+    sweep.add_argument('--beta', action='store_true', help='also write averaged beta and beta = 0.5 crossings')
+    sweep.add_argument('--onset', type=float, metavar='LEVEL',
+                       help='also write the potential (V-SHE) where G_2C reaches LEVEL eV, e.g. 0')
+    sweep.add_argument('--figures', metavar='DIR', help='write figures into DIR')
+    sweep.add_argument('-j', '--workers', type=int, default=1, help='worker processes (default 1)')
+    sweep.add_argument('--chunk-size', type=int, default=None, help='reactions per chunk (per streamed block with --stream)')
+    sweep.add_argument('--store', metavar='DIR',
+                       help='keep the result tensor in DIR and only recompute changed reactions and new grid values')
+    sweep.add_argument('--stream', metavar='DIR',
+                       help='stream blocks into DIR/values.npy with min/max over U, beta_avg and onset reductions '
+                            'instead of holding the result in memory (for grids larger than RAM)')
+    sweep.add_argument('--float32', dest='dtype', action='store_const', const='float32', default='float64',
+                       help='evaluate and store the potential grid in single precision (about 1e-6 eV error)')
+    sweep.add_argument('--edl', default='helmholtz', metavar='MODEL',
+                       help="EDL model: helmholtz (default), gcs[:<mol/L>] (Gouy-Chapman-Stern) or table:<file.csv> "
+                            "(columns U_prime, C in uF/cm^2)")
+    sweep.add_argument('--jit', action='store_true', help='evaluate the kernel with numba (pip install numba)')
+    sweep.add_argument('--cache', nargs='?', const=True, default=None, metavar='DIR',
+                       help='reuse unchanged reaction rows from the per-row result cache in DIR (default '
+                            '~/.cache/agcdft/sweeps or $AGCDFT_CACHE/sweeps) and store new ones there; off by '
+                            'default. Use --cache=DIR when it precedes the dataset')
+    sweep.add_argument('--no-cache', action='store_true', help='parse the dataset without the on-disk dataset cache')
+    sweep.add_argument('--profile', metavar='TRACE.json',
+                       help='time every pipeline stage and write a Chrome trace with a per-stage summary')
+    sweep.add_argument('-q', '--quiet', action='store_true', help='do not print written paths')
+    sweep.set_defaults(func=sweep_command, parser=sweep)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
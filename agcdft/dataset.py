@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Reaction dataset loader with a cached columnar copy of the Excel template
+
+The Excel template (see Sensitivity_JPCC_2024/Excel Sheet/CO_data.xlsx) holds
+one reaction per row:
+
+    M, E_In, DM_In, Polar_In, G_Solv, E_Fin, DM_Fin, Polar_Fin, Polar_Bare, Area, Upzc
+
+with the bare-surface constants (Polar_Bare, Area, Upzc) given on the first
+row only. An optional boolean Faradaic column flags chemical steps.
+
+load_reactions() parses a sheet once and stores it as an .npz file keyed on
+the SHA-256 of the workbook and the sheet name. Later loads read the .npz and
+never import pandas. Every numeric column comes back as a contiguous float64
+array, with the surface constants filled down to every row.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from .profiling import profiled
+
+CACHE_VERSION = 1 #Bump when the cached layout changes
+NUMERIC_COLUMNS = ('E_In', 'DM_In', 'Polar_In', 'G_Solv', 'E_Fin', 'DM_Fin', 'Polar_Fin',
+                   'Polar_Bare', 'Area', 'Upzc')
+SURFACE_COLUMNS = ('Polar_Bare', 'Area', 'Upzc') #Given once per sheet, filled down to every row
+
+
+def default_cache_dir():
+    """Cache folder: $AGCDFT_CACHE or ~/.cache/agcdft."""
+    return os.environ.get('AGCDFT_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'agcdft'))
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 hex digest of a file, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+@profiled('load')
+def _parse_sheet(path, sheet):
+    """Parse one sheet (or a CSV file) into a dict of column arrays."""
+    import pandas as pd
+
+    if os.path.splitext(path)[1].lower() == '.csv':
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path, sheet_name=sheet if sheet is not None else 0)
+    missing = [c for c in ('M',) + NUMERIC_COLUMNS if c not in df.columns]
+    if missing:
+        raise KeyError("%s is missing columns %s" % (path, missing))
+
+    df = df.dropna(subset=['M'])
+    df[list(SURFACE_COLUMNS)] = df[list(SURFACE_COLUMNS)].ffill()
+    data = {'M': df['M'].astype(str).to_numpy(dtype=str)}
+    for col in NUMERIC_COLUMNS:
+        data[col] = np.ascontiguousarray(df[col].to_numpy(dtype=np.float64))
+    if 'Faradaic' in df.columns:
+        data['Faradaic'] = np.ascontiguousarray(df['Faradaic'].fillna(True).to_numpy(dtype=bool))
+    return data
+
+
+@profiled('load')
+def load_reactions(path, sheet=None, cache_dir=None, use_cache=True):
+    """
+    Load one sheet of the reaction template as a dict of column arrays.
+
+    Parameters
+    ----------
+    path : str
+        Excel workbook (or CSV file) following the reaction template.
+    sheet : str, optional
+        Sheet name, e.g. '111.py' or '100.py'. Defaults to the first sheet.
+    cache_dir : str, optional
+        Where the .npz copies are kept. Defaults to default_cache_dir().
+    use_cache : bool
+        False always parses the file and leaves the cache untouched.
+
+    Returns
+    -------
+    dict
+        'M' holds the reaction names, every template column holds a
+        contiguous float64 array and 'Faradaic' a bool array if present.
+    """
+    if not use_cache:
+        return _parse_sheet(path, sheet)
+
+    cache_dir = cache_dir or default_cache_dir()
+    key = hashlib.sha256(('%s|%s|%d' % (file_hash(path), sheet, CACHE_VERSION)).encode()).hexdigest()
+    cache_file = os.path.join(cache_dir, 'reactions_%s.npz' % key)
+    if os.path.exists(cache_file):
+        with np.load(cache_file, allow_pickle=False) as npz:
+            return {k: (npz[k] if k == 'M' else np.ascontiguousarray(npz[k])) for k in npz.files}
+
+    data = _parse_sheet(path, sheet)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = '%s.%d.tmp.npz' % (cache_file[:-4], os.getpid())
+    np.savez(tmp, **data)
+    os.replace(tmp, cache_file) #atomic, so concurrent jobs never read a partial file
+    return data
+
+
+def kernel_inputs(data):
+    """
+    Map loaded columns onto the keyword arguments of agcdft.edl_terms().
+
+    Polarizabilities are corrected by the bare-surface polarizability so only
+    the adsorbate contribution is kept.
+    """
+    return {
+        'e_in': data['E_In'],
+        'e_fin': data['E_Fin'],
+        'dm_in': data['DM_In'],
+        'dm_fin': data['DM_Fin'],
+        'polar_in': data['Polar_In'] - data['Polar_Bare'],
+        'polar_fin': data['Polar_Fin'] - data['Polar_Bare'],
+        'g_solv': data['G_Solv'],
+        'area': data['Area'],
+        'u_pzc': data['Upzc'],
+        'faradaic': data.get('Faradaic', np.ones(len(data['M']), dtype=bool)),
+    }
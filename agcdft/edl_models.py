@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Pluggable EDL models: Helmholtz, Gouy-Chapman-Stern and tabulated capacitance
+
+The aGC-DFT energy terms only need two properties of the double layer at the
+electrode potential U' = U - U_pzc: the surface charge density sigma(U') and
+the differential capacitance C(U') = dsigma/dU', both per unit area. With the
+adsorbate in the inner (Helmholtz/Stern) layer of permittivity e = er*e_vac,
+
+    field     F(U') = sigma / e                  (V/A)
+    dipole    g(U') = C / (e^2 * a)              (field of a unit dipole, V/(eA^2))
+
+    c_total  = -1/2*d(mu^2)*g + d(mu)*F
+    dm_total = -d(mu^2)*g + d(mu)*F
+    p_total  =  1/2*d(alpha)*F^2 - d(alpha*mu)*g*F + 1/2*d(alpha*mu^2)*g^2
+
+For the Helmholtz capacitor (C = e/d, sigma = C*U') F = U'/d and
+g = 1/(e*a*d), and these are exactly the C_0, C_const_1, p_0, p_const_1 and
+p_const_2 terms of agcdft.kernel. For other models g uses the differential
+capacitance at U' (linear response around the charged interface).
+
+Every model is a small picklable object with
+
+    charge(u_prime, er, d, e_vac) -> (sigma, capacitance)
+    key()                         -> string identifying the model in caches
+
+Pass it as edl_model= to edl_terms(), edl_terms_into(), run_sweep(),
+incremental_sweep(), stream_sweep() or sweep_dataset(). Helmholtz is the
+default and the only model whose terms are polynomials in U', so the closed
+forms (edl_polynomials, beta, onset potentials, kinetics) assume it.
+
+Units: sigma in e/A^2, capacitance in e V^-1 A^-2 (UF_CM2 per uF/cm^2).
+
+Reference: https://doi.org/10.1016/j.jcat.2024.115360
+"""
+
+import hashlib
+
+import numpy as np
+
+from .kernel import E_VAC, K_B
+
+UF_CM2 = 1e-22 / 1.602176634e-19 #1 uF/cm^2 in e V^-1 A^-2
+AVOGADRO_A3 = 6.02214076e23 / 1e27 #1 mol/L in ions per A^3
+
+
+class EDLModel:
+    """Base class of the EDL models; subclasses implement charge() and key()."""
+
+    polynomial = False #True when the terms are exact polynomials in U' (Helmholtz)
+
+    def charge(self, u_prime, er, d, e_vac=E_VAC):
+        """Surface charge density and differential capacitance, broadcast over the inputs."""
+        raise NotImplementedError
+
+    def key(self):
+        raise NotImplementedError
+
+    def energy_terms(self, deltas, u_prime, er, d, area, e_vac=E_VAC):
+        """
+        c_total, dm_total and p_total on the (reaction, er, d, U) grid.
+
+        deltas holds the outputs of agcdft.kernel.reaction_deltas() laid out
+        along the reaction axis; u_prime, er, d and area are broadcastable
+        grid arrays.
+        """
+        sigma, cap = self.charge(u_prime, er, d, e_vac)
+        e = er * e_vac
+        field = sigma / e
+        g = cap / (e ** 2 * area)
+        c_total = -0.5 * deltas['diff_dm_sq'] * g + deltas['diff_dm'] * field
+        dm_total = c_total - 0.5 * deltas['diff_dm_sq'] * g
+        p_total = (0.5 * deltas['diff_polar'] * field ** 2 - deltas['diff_a_dm'] * g * field
+                   + 0.5 * deltas['diff_dm_polar_sq'] * g ** 2)
+        return c_total, dm_total, p_total
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, self.key())
+
+
+class Helmholtz(EDLModel):
+    """Parallel-plate capacitor of width d: C = er*e_vac/d (the default model)."""
+
+    polynomial = True
+
+    def charge(self, u_prime, er, d, e_vac=E_VAC):
+        cap = er * e_vac / d
+        return cap * u_prime, np.broadcast_to(cap, np.broadcast(cap, u_prime).shape)
+
+    def key(self):
+        return 'helmholtz'
+
+
+class GouyChapmanStern(EDLModel):
+    """
+    Stern layer (width d, permittivity er) in series with a Gouy-Chapman diffuse layer.
+
+    The diffuse layer of a symmetric z:z electrolyte carries
+
+        sigma = sqrt(8*er_diffuse*e_vac*kT*n0) * sinh(z*phi_d/(2kT))
+
+    and U' = phi_d + sigma/C_H with C_H = er*e_vac/d. U' is monotone in
+    phi_d, so phi_d is found by bisection on every distinct (er, d, U')
+    triple, not on every grid point: the U' values of a sweep only depend on
+    the surface (U_pzc), so one table serves every reaction of a dataset.
+    Tables are kept per instance, i.e. per electrolyte, and reused by later
+    calls on the same grid. The total differential capacitance is
+    1/C = 1/C_H + 1/C_D.
+
+    Parameters
+    ----------
+    concentration : float
+        Bulk electrolyte concentration (mol/L).
+    z : int
+        Ion charge number.
+    er_diffuse : float
+        Relative permittivity of the diffuse layer (bulk water by default).
+    temperature : float
+        Temperature (K).
+    """
+
+    MAX_TABLES = 32
+
+    def __init__(self, concentration=0.1, z=1, er_diffuse=78.4, temperature=298.15):
+        self.concentration = float(concentration)
+        self.z = int(z)
+        self.er_diffuse = float(er_diffuse)
+        self.temperature = float(temperature)
+        self._tables = {}
+
+    def key(self):
+        return 'gcs c=%r z=%d er_diffuse=%r T=%r' % (self.concentration, self.z, self.er_diffuse, self.temperature)
+
+    def _diffuse(self, phi_d, e_vac):
+        """Diffuse-layer charge density and differential capacitance at potential phi_d."""
+        kt = K_B * self.temperature
+        n0 = self.concentration * AVOGADRO_A3
+        x = self.z * phi_d / (2 * kt)
+        amp = np.sqrt(8 * self.er_diffuse * e_vac * kt * n0)
+        return amp * np.sinh(x), amp * np.cosh(x) * self.z / (2 * kt)
+
+    def table(self, er, d, u_prime, e_vac=E_VAC, iterations=64):
+        """
+        sigma and capacitance at every (er, d, U') of the 1D inputs, shape (E, D, U).
+
+        Solved once per grid and electrolyte and cached on the instance.
+        """
+        er, d, u_prime = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (er, d, u_prime))
+        key = (er.tobytes(), d.tobytes(), u_prime.tobytes(), float(e_vac))
+        if key in self._tables:
+            return self._tables[key]
+        c_h = (er[:, None] * e_vac / d[None, :])[..., None] # (E, D, 1)
+        target = np.broadcast_to(u_prime, c_h.shape[:2] + (u_prime.size,))
+        # phi_d lies between 0 and U' (same sign, smaller magnitude)
+        low, high = np.minimum(target, 0.0), np.maximum(target, 0.0)
+        for _ in range(iterations):
+            mid = 0.5 * (low + high)
+            above = mid + self._diffuse(mid, e_vac)[0] / c_h > target
+            high = np.where(above, mid, high)
+            low = np.where(above, low, mid)
+        sigma, c_d = self._diffuse(0.5 * (low + high), e_vac)
+        out = (sigma, 1.0 / (1.0 / c_h + 1.0 / c_d))
+        if len(self._tables) >= self.MAX_TABLES:
+            self._tables.pop(next(iter(self._tables)))
+        self._tables[key] = out
+        return out
+
+    def charge(self, u_prime, er, d, e_vac=E_VAC):
+        """u_prime of shape (R, 1, 1, U) and 1D er, d (any layout); returns (R, E, D, U) arrays."""
+        u_prime = np.asarray(u_prime, dtype=float)
+        values, index = np.unique(u_prime, return_inverse=True)
+        sigma, cap = self.table(np.ravel(er), np.ravel(d), values, e_vac)
+        # (E, D, distinct U') -> (R, E, D, U)
+        take = index.reshape(u_prime.shape[0], -1)
+        sigma = sigma[:, :, take].transpose(2, 0, 1, 3)
+        cap = cap[:, :, take].transpose(2, 0, 1, 3)
+        return sigma, cap
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_tables'] = {} #Rebuilt where needed, keeps worker payloads small
+        return state
+
+
+class TabulatedCapacitance(EDLModel):
+    """
+    Measured or simulated differential capacitance curve C(U') of one electrolyte.
+
+    C is linear between the tabulated points and constant beyond them, and
+    sigma(U') is its exact integral from U' = 0, so field and dipole terms
+    come from the same curve. The curve is the total interfacial capacitance,
+    so the EDL width does not enter (results are constant along the d axis);
+    er sets the permittivity the adsorbate sees, and er*e_vac/C is the
+    effective Helmholtz width of the curve.
+
+    Parameters
+    ----------
+    u_prime : array_like
+        Potentials versus the potential of zero charge (V), increasing.
+    capacitance : array_like
+        Differential capacitance at u_prime, in uF/cm^2 (or in e V^-1 A^-2
+        with units='atomic').
+    name : str, optional
+        Label shown in repr(). key() is always the SHA-256 of the curve,
+        so editing a file under the same name invalidates cached sweeps.
+    """
+
+    def __init__(self, u_prime, capacitance, name=None, units='uF/cm2'):
+        self.u = np.asarray(u_prime, dtype=float)
+        cap = np.asarray(capacitance, dtype=float)
+        if units not in ('uF/cm2', 'atomic'):
+            raise ValueError("units must be 'uF/cm2' or 'atomic', got %r" % (units,))
+        self.c = cap * UF_CM2 if units == 'uF/cm2' else cap
+        if self.u.ndim != 1 or self.u.shape != self.c.shape or self.u.size < 2 or np.any(np.diff(self.u) <= 0):
+            raise ValueError("u_prime and capacitance must be 1D of the same length with increasing u_prime")
+        # Charge at the knots, exact for piecewise linear C
+        self._knots = np.concatenate(([0.0], np.cumsum(0.5 * (self.c[1:] + self.c[:-1]) * np.diff(self.u))))
+        self._zero = self._integral(np.array(0.0)) #sigma(0) = 0 at the potential of zero charge
+        self.digest = hashlib.sha256(self.u.tobytes() + self.c.tobytes()).hexdigest()
+        self.name = name
+
+    @classmethod
+    def from_csv(cls, path, name=None):
+        """Read a curve from a CSV file with columns U_prime and C (uF/cm^2)."""
+        data = np.genfromtxt(path, delimiter=',', names=True)
+        return cls(data['U_prime'], data['C'], name=name or path)
+
+    def _integral(self, x):
+        """Integral of C from the first tabulated potential to x."""
+        i = np.clip(np.searchsorted(self.u, x, side='right') - 1, 0, self.u.size - 2)
+        t = np.clip(x, self.u[0], self.u[-1]) - self.u[i]
+        slope = (self.c[i + 1] - self.c[i]) / (self.u[i + 1] - self.u[i])
+        # Beyond the table C stays at its end values
+        beyond = (np.where(x > self.u[-1], self.c[-1] * (x - self.u[-1]), 0.0)
+                  + np.where(x < self.u[0], self.c[0] * (x - self.u[0]), 0.0))
+        return self._knots[i] + self.c[i] * t + 0.5 * slope * t ** 2 + beyond
+
+    def charge(self, u_prime, er, d, e_vac=E_VAC):
+        u_prime = np.asarray(u_prime, dtype=float)
+        return self._integral(u_prime) - self._zero, np.interp(u_prime, self.u, self.c)
+
+    def key(self):
+        return 'table sha256=%s' % self.digest
+
+    def __repr__(self):
+        return '%s(%s, sha256=%s)' % (type(self).__name__, self.name or '', self.digest[:16])
+
+
+def edl_model_from_spec(spec):
+    """
+    EDL model from a short text spec, as used by `python -m agcdft sweep --edl`:
+    'helmholtz', 'gcs' or 'gcs:<mol/L>', 'table:<file.csv>'.
+    """
+    kind, _, arg = spec.partition(':')
+    kind = kind.strip().lower()
+    if kind == 'helmholtz':
+        return Helmholtz()
+    if kind == 'gcs':
+        return GouyChapmanStern(float(arg)) if arg else GouyChapmanStern()
+    if kind == 'table' and arg:
+        return TabulatedCapacitance.from_csv(arg)
+    raise ValueError("unknown EDL model %r, expected 'helmholtz', 'gcs[:<mol/L>]' or 'table:<file.csv>'" % spec)
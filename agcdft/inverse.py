@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Inverse fitting of EDL parameters (er, d) to measured Tafel slopes
+
+A Tafel slope b (mV/dec) gives the symmetry factor beta = 2.303*kT/(e*b).
+With the analytic Model 2C expression (agcdft.beta)
+
+    beta(U') = f + 2*diff_dm/d - diff_a_dm/(er*e_vac*a*d^2) + diff_polar/d^2 * U'
+
+a single measured beta fixes er for every d in closed form (the feasible
+(er, d) curve, er_curve()), and a potential-dependent beta (several Tafel
+slopes along U) fixes both: the slope of beta(U') is diff_polar/d^2, which
+gives d, and the intercept then gives er (fit_edl()). Confidence regions of
+the fit follow from the regression covariance by the delta method; they are
+linearized and become optimistic when the beta slope is barely resolved
+(relative error of a_beta beyond ~10%), er being the less determined of the two.
+
+Every function works on a whole table of experiments at once: inputs run
+along axis 0 (one row per experiment) and missing points are NaN.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+
+from .kernel import E_VAC, K_B
+from .profiling import profiled
+
+
+def tafel_to_beta(slope, temperature=298.15):
+    """Symmetry factor from a Tafel slope in mV/dec (sign ignored)."""
+    return np.log(10) * K_B * temperature / (np.abs(np.asarray(slope, dtype=float)) * 1e-3)
+
+
+def beta_to_tafel(beta, temperature=298.15):
+    """Tafel slope (mV/dec) of a symmetry factor."""
+    return np.log(10) * K_B * temperature / np.asarray(beta, dtype=float) * 1e3
+
+
+@profiled('post')
+def er_curve(beta, diff_dm, diff_polar, diff_a_dm, d, area, u_prime=0.0, faradaic=True, e_vac=E_VAC):
+    """
+    Dielectric constant reproducing a measured beta at every EDL width.
+
+    Parameters
+    ----------
+    beta : array_like, shape (X,)
+        Measured symmetry factor of each experiment, e.g. from
+        tafel_to_beta(). A window-averaged beta belongs to the window midpoint.
+    diff_dm, diff_polar, diff_a_dm, area : array_like, shape (X,) or scalar
+        As in agcdft.beta_coefficients().
+    d : array_like, shape (D,)
+        EDL widths (A) at which er is solved.
+    u_prime : array_like, shape (X,) or scalar
+        Potential of the measurement relative to U_pzc (V).
+
+    Returns
+    -------
+    ndarray, shape (X, D)
+        er on the feasible curve; NaN where no er >= 1 reproduces beta
+        (or where beta does not depend on er, diff_a_dm = 0).
+    """
+    col = lambda x: np.atleast_1d(np.asarray(x, dtype=float))[:, None]
+    d = np.atleast_1d(np.asarray(d, dtype=float))[None, :]
+    f = col(np.asarray(faradaic, dtype=float))
+    rest = f + 2 * col(diff_dm) / d + col(diff_polar) * col(u_prime) / d ** 2 - col(beta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        er = col(diff_a_dm) / (e_vac * col(area) * d ** 2 * rest)
+    return np.where(np.isfinite(er) & (er >= 1), er, np.nan)
+
+
+def fit_beta_line(u, beta, sigma=None):
+    """
+    Weighted straight-line fit beta = c_0 + c_1*U for many experiments.
+
+    Parameters
+    ----------
+    u, beta : array_like, shape (X, P)
+        Potentials (V-SHE) and measured symmetry factors; NaN pads
+        experiments with fewer points.
+    sigma : array_like, shape (X, P), optional
+        Standard errors of beta. Without them the residual variance is used.
+
+    Returns
+    -------
+    dict
+        'coef' (X, 2) as (c_0, c_1), 'cov' (X, 2, 2), 'n' and 'rmse'.
+    """
+    u, beta = np.broadcast_arrays(np.atleast_2d(np.asarray(u, dtype=float)), np.atleast_2d(np.asarray(beta, dtype=float)))
+    ok = np.isfinite(u) & np.isfinite(beta)
+    w = np.where(ok, 1.0 if sigma is None else 1 / np.asarray(sigma, dtype=float) ** 2, 0.0)
+    u0, b0 = np.where(ok, u, 0.0), np.where(ok, beta, 0.0)
+    s, su, sb = w.sum(1), (w * u0).sum(1), (w * b0).sum(1)
+    suu, sub = (w * u0 ** 2).sum(1), (w * u0 * b0).sum(1)
+    n = ok.sum(1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        det = s * suu - su ** 2
+        c1 = (s * sub - su * sb) / det
+        c0 = (sb - c1 * su) / s
+        resid = np.where(ok, beta - c0[:, None] - c1[:, None] * u, 0.0)
+        chi2 = (w * resid ** 2).sum(1)
+        scale = chi2 / (n - 2) if sigma is None else np.ones_like(s)
+        cov = np.empty(s.shape + (2, 2))
+        cov[:, 0, 0] = suu / det * scale
+        cov[:, 1, 1] = s / det * scale
+        cov[:, 0, 1] = cov[:, 1, 0] = -su / det * scale
+        rmse = np.sqrt((resid ** 2).sum(1) / n)
+    return {'coef': np.stack([c0, c1], axis=1), 'cov': cov, 'n': n, 'rmse': rmse}
+
+
+@profiled('post')
+def fit_edl(u, beta, diff_dm, diff_polar, diff_a_dm, area, u_pzc, faradaic=True, sigma=None,
+            level=0.95, e_vac=E_VAC):
+    """
+    Best-fit (d, er) of each experiment from beta measured at several potentials.
+
+    The fitted line beta = c_0 + c_1*U gives a_beta = c_1/2 and
+    b_beta = c_0 + c_1*U_pzc, then
+
+        d  = sqrt(diff_polar/(2*a_beta))
+        er = diff_a_dm/(e_vac*a*d^2*(f + 2*diff_dm/d - b_beta))
+
+    Parameters
+    ----------
+    u, beta, sigma : array_like, shape (X, P)
+        As in fit_beta_line().
+    diff_dm, diff_polar, diff_a_dm, area, u_pzc, faradaic : array_like, shape (X,)
+        Per-experiment reaction properties as in agcdft.beta_coefficients().
+    level : float
+        Confidence level of the returned intervals.
+
+    Returns
+    -------
+    dict of arrays, shape (X,)
+        'd', 'er', their standard errors 'd_se', 'er_se', confidence
+        intervals 'd_ci', 'er_ci' (shape (X, 2)), 'cov' of (d, er) (X, 2, 2),
+        plus 'a_beta', 'b_beta' and the line fit. Entries whose slope has
+        the wrong sign for diff_polar, or whose er is not positive, are NaN.
+    """
+    line = fit_beta_line(u, beta, sigma)
+    x = line['coef'].shape[0]
+    row = lambda v: np.broadcast_to(np.asarray(v, dtype=float), (x,))
+    dm, dp, dadm, a, pzc, f = (row(v) for v in (diff_dm, diff_polar, diff_a_dm, area, u_pzc, faradaic))
+
+    # (c_0, c_1) -> (a_beta, b_beta)
+    c0, c1 = line['coef'][:, 0], line['coef'][:, 1]
+    a_beta, b_beta = c1 / 2, c0 + c1 * pzc
+    J1 = np.zeros((x, 2, 2))
+    J1[:, 0, 1] = 0.5
+    J1[:, 1, 0] = 1.0
+    J1[:, 1, 1] = pzc
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d = np.sqrt(dp / (2 * a_beta))
+        k = dadm / (e_vac * a)
+        g = d ** 2 * (f - b_beta) + 2 * dm * d
+        er = k / g
+        # (a_beta, b_beta) -> (d, er)
+        dd_da = -d / (2 * a_beta)
+        der_dd = -k * (2 * d * (f - b_beta) + 2 * dm) / g ** 2
+        der_db = k * d ** 2 / g ** 2
+    J2 = np.zeros((x, 2, 2))
+    J2[:, 0, 0] = dd_da
+    J2[:, 1, 0] = der_dd * dd_da
+    J2[:, 1, 1] = der_db
+    J = J2 @ J1
+    cov = J @ line['cov'] @ np.swapaxes(J, 1, 2)
+
+    valid = np.isfinite(d) & np.isfinite(er) & (er > 0)
+    d, er = np.where(valid, d, np.nan), np.where(valid, er, np.nan)
+    cov = np.where(valid[:, None, None], cov, np.nan)
+    d_se, er_se = np.sqrt(cov[:, 0, 0]), np.sqrt(cov[:, 1, 1])
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    return {'d': d, 'er': er, 'd_se': d_se, 'er_se': er_se,
+            'd_ci': np.stack([d - z * d_se, d + z * d_se], axis=1),
+            'er_ci': np.stack([er - z * er_se, er + z * er_se], axis=1),
+            'cov': cov, 'a_beta': a_beta, 'b_beta': b_beta, 'line': line}
@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized analytical GC-DFT kernel (Models 1A, 1B, 2A, 2B and 2C)
+
+Every calculator in this repository evaluates the same Helmholtz-model expansion
+of the free energy in U' = U - U_pzc:
+
+    Model 1B: G_1B = G_1A + U'                        (faradaic steps only)
+    Model 2A: G_2A = G_1B + C_0 + C_const_1*U'        (capacitive charging)
+    Model 2B: G_2B = G_2A + 2*C_0 + C_const_1*U'      (dipole-field)
+    Model 2C: G_2C = G_2B + p_0 + p_1*U' + p_2*U'^2   (induced dipole-field)
+
+edl_terms() evaluates all of them in one call on a dense grid with axes
+(reaction, er, d, U). Per-reaction inputs (energies, dipoles, polarizabilities,
+area, U_pzc, faradaic flag) run along axis 0, dielectric constants along axis 1,
+EDL widths along axis 2 and potentials along axis 3. edl_terms_into() is the
+fused form used by the sweeps: it evaluates each requested term by Horner's
+rule in U' straight into a caller-provided array, with no grid-sized
+temporaries.
+The Helmholtz capacitor is the default double layer; other models
+(Gouy-Chapman-Stern, tabulated capacitance) plug in through edl_model=, see
+agcdft.edl_models.
+
+Reference: https://doi.org/10.1016/j.jcat.2024.115360
+
+Units: energies in eV, dipole moments in eA, polarizabilities in eA^2V^-1,
+area in A^2, d in A and potentials in V.
+"""
+
+import numpy as np
+
+from .profiling import profiled
+
+E_VAC = 0.00553 #Vacuum permittivity (e V^-1 A^-1)
+K_B = 8.617333262e-5 #Boltzmann constant (eV/K)
+VAC_NHE = 4.6 #Converting from V-Abs to V-NHE
+AXES = ('reaction', 'er', 'd', 'u') #Axis order of every grid returned by the kernel
+MODEL_VERSION = 2 #Bump when kernel results change, invalidates cached sweeps
+FLOAT32_ERROR = 8 * 2.0 ** -24 #Relative bound of dtype=float32 results, per unit sum of |term| magnitudes
+
+
+def reaction_axis(x, ndim=4):
+    """Return x as a float array laid out along the reaction axis (axis 0)."""
+    return np.atleast_1d(np.asarray(x, dtype=float)).reshape((-1,) + (1,) * (ndim - 1))
+
+
+def grid_axis(x, axis, ndim=4):
+    """Return the 1D array x laid out along ``axis`` of an ``ndim`` grid."""
+    shape = [1] * ndim
+    shape[axis] = -1
+    return np.atleast_1d(np.asarray(x, dtype=float)).reshape(shape)
+
+
+@profiled('derive')
+def reaction_deltas(dm_in, dm_fin, polar_in, polar_fin):
+    """
+    Dipole moment and polarizability changes along the reaction path.
+
+    polar_in and polar_fin are the adsorbate polarizabilities (bare metal
+    already subtracted). Inputs broadcast element-wise.
+    """
+    dm_in = np.asarray(dm_in, dtype=float)
+    dm_fin = np.asarray(dm_fin, dtype=float)
+    polar_in = np.asarray(polar_in, dtype=float)
+    polar_fin = np.asarray(polar_fin, dtype=float)
+    return {
+        'diff_dm': dm_fin - dm_in,
+        'diff_polar': polar_fin - polar_in,
+        'diff_dm_sq': dm_fin ** 2 - dm_in ** 2,
+        'diff_dm_polar_sq': polar_fin * dm_fin * dm_fin - polar_in * dm_in * dm_in,
+        'diff_a_dm': polar_fin * dm_fin - polar_in * dm_in,
+    }
+
+
+def _edl_constants(dm_in, dm_fin, polar_in, polar_fin, er, d, area, e_vac=E_VAC, paired=False):
+    """
+    Potential-independent EDL constants on the (reaction, er, d) grid, or on
+    (reaction, 1, 1) when er and d are paired with the reactions.
+    """
+    deltas = reaction_deltas(reaction_axis(dm_in, 3), reaction_axis(dm_fin, 3),
+                             reaction_axis(polar_in, 3), reaction_axis(polar_fin, 3))
+    a = reaction_axis(area, 3)
+    if paired:
+        e = reaction_axis(er, 3) * e_vac
+        d = reaction_axis(d, 3)
+    else:
+        e = grid_axis(er, 1, 3) * e_vac #complex permittivity
+        d = grid_axis(d, 2, 3)
+
+    C = e * a / d # Predicted Capacitiance by Helmholtz Model
+    C_0 = -0.5 * deltas['diff_dm_sq'] / (C * d ** 2) # 0th order capacitance
+    C_const_1 = deltas['diff_dm'] / d # 1st order wrt U'
+    p_0 = deltas['diff_dm_polar_sq'] / (2 * e ** 2 * a ** 2 * d ** 2) # Polarizability 0th order
+    p_const_1 = -deltas['diff_a_dm'] / (e * a * d ** 2) # Polarizability 1st order wrt U'
+    p_const_2 = 0.5 * deltas['diff_polar'] / d ** 2 # Polarizability 2nd order wrt U'
+    return {'C_0': C_0, 'C_const_1': C_const_1, 'p_0': p_0,
+            'p_const_1': p_const_1, 'p_const_2': p_const_2}
+
+
+def _g_1a(e_in, e_fin, g_solv, u_pzc, faradaic):
+    """Model 1A free energy change at U_pzc, shape (R,)."""
+    g_1a = (np.asarray(e_fin, dtype=float) - np.asarray(e_in, dtype=float)
+            + np.asarray(g_solv, dtype=float) + np.where(faradaic, u_pzc, 0.0))
+    return np.broadcast_to(g_1a, np.shape(u_pzc))
+
+
+@profiled('kernel')
+def edl_terms(e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, er, d, u, area, u_pzc,
+              g_solv=0.0, faradaic=True, e_vac=E_VAC, dtype=np.float64, edl_model=None):
+    """
+    Evaluate Models 1A-2C for every (reaction, er, d, U) combination.
+
+    Parameters
+    ----------
+    e_in, e_fin : array_like, shape (R,)
+        Energies of the initial and final (or transition) states (eV).
+    dm_in, dm_fin : array_like, shape (R,)
+        Dipole moments of the initial and final states (eA).
+    polar_in, polar_fin : array_like, shape (R,)
+        Adsorbate polarizabilities, bare metal subtracted (eA^2V^-1).
+    er, d : array_like, shapes (E,) and (D,)
+        Relative permittivities and Helmholtz EDL widths (A).
+    u : array_like, shape (U,)
+        Applied potentials (V-SHE).
+    area, u_pzc : array_like, shape (R,) or scalar
+        Surface area (A^2) and potential of zero charge (V-SHE) of the
+        surface each reaction runs on.
+    g_solv : array_like, shape (R,) or scalar
+        Solvation free energy change (eV).
+    faradaic : bool or array_like of bool, shape (R,)
+        False for chemical (non-faradaic) steps, which carry neither the
+        U_pzc shift in Model 1A nor the U' term in Model 1B.
+    dtype : numpy dtype
+        Precision of the (R, E, D, U) grids. The potential-independent
+        constants and G_1A are always formed in float64 (E_fin - E_in
+        cancels hundreds of eV), so float32 only rounds the expansion in U':
+        every entry is within about 8 * 2**-24 times the sum of the
+        magnitudes of its terms of the float64 value, i.e. a few 1e-6 eV
+        for terms of a few eV. See FLOAT32_ERROR.
+    edl_model : agcdft.edl_models.EDLModel, optional
+        Double-layer model giving the charge and capacitance versus U'.
+        Defaults to the Helmholtz capacitor C = er*e_vac/d.
+
+    Returns
+    -------
+    dict
+        'u' is the potential axis, 'g_1a' has shape (R,) and every other entry
+        ('u_prime', 'g_1b', 'g_2a', 'g_2b', 'g_2c', 'c_total', 'dm_total',
+        'p_total', 'EDL_total') has shape (R, E, D, U).
+    """
+    u = np.atleast_1d(np.asarray(u, dtype=float))
+    n = np.broadcast(*(np.atleast_1d(x) for x in
+                       (e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, area, u_pzc, g_solv, faradaic))).size
+    shape = (n, np.size(er), np.size(d), u.size)
+
+    f = np.broadcast_to(np.asarray(faradaic, dtype=bool), (n,))
+    pzc = np.broadcast_to(np.asarray(u_pzc, dtype=float), (n,))
+    area = np.broadcast_to(np.asarray(area, dtype=float), (n,))
+
+    u_prime = (u - reaction_axis(pzc)).astype(dtype, copy=False)
+
+    # Model 1A: Free Energy Change at U_PZC (chemical steps carry no U_pzc shift)
+    g_1a = _g_1a(e_in, e_fin, g_solv, pzc, f)
+    # Model 1B: Beta = 1 for faradaic steps, Beta = 0 for chemical steps
+    g_1b = reaction_axis(g_1a).astype(dtype, copy=False) + reaction_axis(f).astype(dtype, copy=False) * u_prime
+
+    if edl_model is not None and not edl_model.polynomial:
+        # Capacitive, dipole-field and polarizability terms from the model's charge and capacitance
+        c_total, dm_total, p_total = (x.astype(dtype, copy=False) for x in _model_terms(
+            edl_model, dm_in, dm_fin, polar_in, polar_fin, er, d, area, u - reaction_axis(pzc), e_vac))
+    else:
+        const = _edl_constants(dm_in, dm_fin, polar_in, polar_fin, er, d, area, e_vac)
+        C_0, C_const_1 = (const[k][..., None].astype(dtype, copy=False) for k in ('C_0', 'C_const_1'))
+        p_0, p_const_1, p_const_2 = (const[k][..., None].astype(dtype, copy=False) for k in ('p_0', 'p_const_1', 'p_const_2'))
+        # Model 2A: Capacitive charging
+        c_total = C_0 + C_const_1 * u_prime
+        # Model 2B: Dipole-field terms
+        dm_total = 2 * C_0 + C_const_1 * u_prime
+        # Model 2C: Polarizability (induced dipole-field terms)
+        p_total = p_0 + p_const_1 * u_prime + p_const_2 * u_prime ** 2
+
+    g_2a = g_1b + c_total
+    g_2b = g_2a + dm_total
+    g_2c = g_2b + p_total
+
+    out = {'u': u, 'g_1a': g_1a}
+    for key, val in (('u_prime', u_prime), ('g_1b', g_1b), ('g_2a', g_2a), ('g_2b', g_2b),
+                     ('g_2c', g_2c), ('c_total', c_total), ('dm_total', dm_total),
+                     ('p_total', p_total), ('EDL_total', c_total + dm_total + p_total)):
+        out[key] = np.broadcast_to(val, shape)
+    return out
+
+
+def _model_terms(edl_model, dm_in, dm_fin, polar_in, polar_fin, er, d, area, u_prime, e_vac):
+    """c_total, dm_total and p_total of a non-Helmholtz EDL model; u_prime has shape (R, 1, 1, U)."""
+    deltas = reaction_deltas(*(reaction_axis(x) for x in (dm_in, dm_fin, polar_in, polar_fin)))
+    return edl_model.energy_terms(deltas, u_prime, grid_axis(er, 1), grid_axis(d, 2), reaction_axis(area), e_vac)
+
+
+class Workspace:
+    """
+    Grow-only scratch arrays reused across kernel calls.
+
+    get(name, shape, dtype) returns a view of a buffer that is only
+    reallocated when a larger one is asked for, so a sweep that evaluates
+    chunk after chunk allocates its scratch space once. Not thread-safe; use
+    one per thread (each worker process has its own).
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=np.float64):
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        buf = self._buffers.get((name, dtype))
+        if buf is None or buf.size < size:
+            buf = self._buffers[(name, dtype)] = np.empty(size, dtype=dtype)
+        return buf[:size].reshape(shape)
+
+
+def _term_coefficients(const, g_1a, f):
+    """Every term of edl_terms() as a polynomial in U' (highest power first) on the (reaction, er, d) grid."""
+    C_0, C_1 = const['C_0'], const['C_const_1']
+    p_0, p_1, p_2 = const['p_0'], const['p_const_1'], const['p_const_2']
+    return {
+        'u_prime': (np.ones_like(f), np.zeros_like(f)),
+        'g_1a': (g_1a,),
+        'g_1b': (f, g_1a),
+        'g_2a': (f + C_1, g_1a + C_0),
+        'g_2b': (f + 2 * C_1, g_1a + 3 * C_0),
+        'g_2c': (p_2, f + 2 * C_1 + p_1, g_1a + 3 * C_0 + p_0),
+        'c_total': (C_1, C_0),
+        'dm_total': (C_1, 2 * C_0),
+        'p_total': (p_2, p_1, p_0),
+        'EDL_total': (p_2, 2 * C_1 + p_1, 3 * C_0 + p_0),
+    }
+
+
+def _horner_into(coeffs, u_prime, dst):
+    """dst = polynomial(u_prime) with in-place ufuncs only."""
+    if len(coeffs) == 1:
+        dst[...] = coeffs[0]
+        return dst
+    np.multiply(coeffs[0], u_prime, out=dst)
+    for c in coeffs[1:-1]:
+        np.add(dst, c, out=dst)
+        np.multiply(dst, u_prime, out=dst)
+    np.add(dst, coeffs[-1], out=dst)
+    return dst
+
+
+_jit_kernel = None
+
+
+def _horner_jit():
+    """Compile (once) the numba loop evaluating every term's quadratic into out[r, e, k, j, t]."""
+    global _jit_kernel
+    if _jit_kernel is None:
+        try:
+            import numba
+        except ImportError:
+            raise ImportError("numba is required for jit=True: pip install numba") from None
+
+        @numba.njit(cache=True, fastmath=False)
+        def kernel(coeffs, u_prime, out):
+            n, n_er, n_d, n_u, n_t = out.shape
+            for r in range(n):
+                for e in range(n_er):
+                    for k in range(n_d):
+                        for t in range(n_t):
+                            c2, c1, c0 = coeffs[t, 0, r, e, k], coeffs[t, 1, r, e, k], coeffs[t, 2, r, e, k]
+                            for j in range(n_u):
+                                x = u_prime[r, j]
+                                out[r, e, k, j, t] = (c2 * x + c1) * x + c0
+        _jit_kernel = kernel
+    return _jit_kernel
+
+
+@profiled('kernel')
+def edl_terms_into(out, terms, e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, er, d, u, area, u_pzc,
+                   g_solv=0.0, faradaic=True, e_vac=E_VAC, workspace=None, jit=False, edl_model=None):
+    """
+    Fused edl_terms(): write the requested terms straight into out.
+
+    Every term is a polynomial of degree <= 2 in U' whose coefficients live
+    on the small (reaction, er, d) grid, so each term is evaluated by Horner's
+    rule with in-place ufuncs (out=) and no (R, E, D, U) temporaries are
+    created: C_1, c_total, dm_total, p_1, p_2, U'^2 and the model sums never
+    exist as arrays. Results agree with edl_terms() to rounding (~1e-15
+    relative in float64) and follow the precision of out. A non-Helmholtz
+    edl_model has no polynomial form; its terms are evaluated as in
+    edl_terms() and copied into out.
+
+    Parameters
+    ----------
+    out : ndarray, shape (R, E, D, U, len(terms))
+        Destination; float64 or float32. Returned.
+    terms : sequence of str
+        Entries of agcdft.sweep.TERMS, in the order of the last axis of out.
+    workspace : Workspace, optional
+        Scratch space for terms that cannot be written in place (out has
+        more than one term, so out[..., t] is strided). Pass the same
+        Workspace to every call of a sweep to allocate it once.
+    jit : bool
+        Evaluate all terms in one compiled loop (requires numba) instead of
+        one ufunc pass per term.
+    edl_model : agcdft.edl_models.EDLModel, optional
+        Defaults to the Helmholtz capacitor.
+
+    Other parameters are those of edl_terms().
+    """
+    u = np.atleast_1d(np.asarray(u, dtype=float))
+    n = np.broadcast(*(np.atleast_1d(x) for x in
+                       (e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, area, u_pzc, g_solv, faradaic))).size
+    shape = (n, np.size(er), np.size(d), u.size)
+    if out.shape != shape + (len(terms),):
+        raise ValueError("out has shape %s, expected %s" % (out.shape, shape + (len(terms),)))
+
+    f = np.broadcast_to(np.asarray(faradaic, dtype=bool), (n,))
+    pzc = np.broadcast_to(np.asarray(u_pzc, dtype=float), (n,))
+    area = np.broadcast_to(np.asarray(area, dtype=float), (n,))
+    g_1a = reaction_axis(_g_1a(e_in, e_fin, g_solv, pzc, f), 3)
+    u_prime = u - reaction_axis(pzc, 2) # (R, U)
+
+    if edl_model is not None and not edl_model.polynomial:
+        if jit:
+            raise ValueError("jit=True needs the Helmholtz model, got %r" % (edl_model,))
+        u_prime = u_prime[:, None, None, :]
+        c_total, dm_total, p_total = _model_terms(edl_model, dm_in, dm_fin, polar_in, polar_fin, er, d, area,
+                                                  u_prime, e_vac)
+        g_1b = g_1a[..., None] + reaction_axis(f) * u_prime
+        values = {'u_prime': u_prime, 'g_1a': g_1a[..., None], 'g_1b': g_1b, 'c_total': c_total,
+                  'dm_total': dm_total, 'p_total': p_total, 'g_2a': g_1b + c_total, 'g_2b': g_1b + c_total + dm_total,
+                  'g_2c': g_1b + c_total + dm_total + p_total, 'EDL_total': c_total + dm_total + p_total}
+        for t, key in enumerate(terms):
+            out[..., t] = values[key]
+        return out
+
+    const = _edl_constants(dm_in, dm_fin, polar_in, polar_fin, er, d, area, e_vac)
+    coeffs = _term_coefficients(const, g_1a, reaction_axis(f, 3))
+
+    if jit:
+        # Pad every polynomial to a quadratic: (T, 3, R, E, D)
+        packed = np.zeros((len(terms), 3) + shape[:3])
+        for t, key in enumerate(terms):
+            for i, c in enumerate(coeffs[key]):
+                packed[t, 3 - len(coeffs[key]) + i] = c
+        _horner_jit()(packed.astype(out.dtype), u_prime.astype(out.dtype), out)
+        return out
+
+    u_prime = u_prime[:, None, None, :].astype(out.dtype, copy=False)
+    if len(terms) > 1:
+        scratch = (workspace or Workspace()).get('term', shape, out.dtype)
+    for t, key in enumerate(terms):
+        c = [np.asarray(x, dtype=out.dtype)[..., None] for x in coeffs[key]]
+        if len(terms) == 1:
+            _horner_into(c, u_prime, out[..., 0])
+        else:
+            out[..., t] = _horner_into(c, u_prime, scratch)
+    return out
+
+
+@profiled('kernel')
+def edl_polynomials(e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, er, d, area, u_pzc,
+                    g_solv=0.0, faradaic=True, e_vac=E_VAC, reference='pzc', paired=False):
+    """
+    Exact polynomial coefficients of Models 1B, 2A, 2B and 2C.
+
+    Takes the same per-reaction inputs as edl_terms() but no potential grid,
+    since every model is an exact polynomial in U': linear for 1B/2A/2B and
+    quadratic for 2C. Coefficients are ordered highest power first, as
+    returned by np.polyfit, so np.polyval(coeffs['2c'][i, j, k], u_prime)
+    reproduces edl_terms()['g_2c'][i, j, k].
+
+    Parameters
+    ----------
+    reference : {'pzc', 'she'}
+        'pzc' returns coefficients in U' = U - U_pzc, 'she' returns them in
+        U (V-SHE) with the U_pzc shift expanded.
+    paired : bool
+        If True, er and d hold one value per reaction (shape (R,)) instead
+        of grid axes, e.g. for sampled parameter sets, and E = D = 1.
+
+    Returns
+    -------
+    dict
+        '1b', '2a' and '2b' have shape (R, E, D, 2) and '2c' has shape
+        (R, E, D, 3).
+    """
+    if reference not in ('pzc', 'she'):
+        raise ValueError("reference must be 'pzc' or 'she', got %r" % (reference,))
+    per_reaction = (e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, area, u_pzc, g_solv, faradaic)
+    n = np.broadcast(*(np.atleast_1d(x) for x in per_reaction + ((er, d) if paired else ()))).size
+    shape = (n, 1, 1) if paired else (n, np.size(er), np.size(d))
+    if paired:
+        er, d = (np.broadcast_to(np.asarray(x, dtype=float), (n,)) for x in (er, d))
+
+    f = np.broadcast_to(np.asarray(faradaic, dtype=bool), (n,))
+    pzc = np.broadcast_to(np.asarray(u_pzc, dtype=float), (n,))
+    const = _edl_constants(*(np.broadcast_to(np.asarray(x, dtype=float), (n,)) for x in (dm_in, dm_fin, polar_in, polar_fin)),
+                           er, d, np.broadcast_to(np.asarray(area, dtype=float), (n,)), e_vac, paired)
+    C_0, C_const_1 = const['C_0'], const['C_const_1']
+    g_1a = reaction_axis(_g_1a(e_in, e_fin, g_solv, pzc, f), 3)
+    f = reaction_axis(f, 3)
+
+    # Slope and intercept of each model in U'
+    coeffs = {
+        '1b': (f, g_1a),
+        '2a': (f + C_const_1, g_1a + C_0),
+        '2b': (f + 2 * C_const_1, g_1a + 3 * C_0),
+        '2c': (const['p_const_2'], f + 2 * C_const_1 + const['p_const_1'], g_1a + 3 * C_0 + const['p_0']),
+    }
+
+    pzc = reaction_axis(pzc, 3)
+    out = {}
+    for model, c in coeffs.items():
+        c = [np.broadcast_to(x, shape) for x in c]
+        if reference == 'she':
+            # Expand the polynomial in U' = U - U_pzc into powers of U
+            if len(c) == 2:
+                c = [c[0], c[1] - c[0] * pzc]
+            else:
+                c = [c[0], c[1] - 2 * c[0] * pzc, c[0] * pzc ** 2 - c[1] * pzc + c[2]]
+        out[model] = np.stack(c, axis=-1)
+    return out
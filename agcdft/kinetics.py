@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Potential-dependent rate constants, currents and Tafel slopes from G_2C barriers
+
+With G_2C the activation free energy of a step (transition state as the
+final state of the reaction template):
+
+    ln k(U)     = ln A - G_2C(U)/kT                 (A = kT/h by default)
+    log10 j(U)  = log10(n*e*Gamma*theta) + ln k(U)/ln(10)
+    Tafel slope = ln(10)*kT/(e*|beta(U)|),          beta(U) = dG_2C/dU
+
+Everything stays in log space, so barriers of several eV neither underflow
+nor overflow. G_2C and beta come from the exact Model 2C polynomial, so the
+local Tafel slope is analytic rather than a finite difference of log j.
+Negative barriers are clipped to 0 by default (rate capped at A); the
+current there no longer depends on potential and the Tafel slope is inf.
+"""
+
+import numpy as np
+
+from .dataset import kernel_inputs
+from .kernel import E_VAC, K_B, edl_polynomials
+from .profiling import profiled
+from .results import EDLResult
+
+H = 4.135667696e-15 #Planck constant (eV s)
+E_CHARGE = 1.602176634e-19 #Elementary charge (C)
+SITE_DENSITY = 1e15 #Active sites per cm^2
+KINETIC_TERMS = ('g_2c', 'beta', 'ln_k', 'log10_j', 'tafel')
+
+
+def log_rate_constants(g_act, temperature=298.15, prefactor=None, clip_barrier=True):
+    """ln k (k in s^-1) of activation free energies g_act (eV); prefactor defaults to kT/h."""
+    kt = K_B * temperature
+    ln_a = np.log(kt / H if prefactor is None else prefactor)
+    g = np.asarray(g_act, dtype=float)
+    if clip_barrier:
+        g = np.maximum(g, 0.0)
+    return ln_a - g / kt
+
+
+def log_current(ln_k, n_electrons=1, site_density=SITE_DENSITY, coverage=1.0):
+    """log10 of the partial current density |j| (mA/cm^2) of rate constants ln_k."""
+    scale = np.log10(np.asarray(n_electrons, dtype=float) * E_CHARGE * site_density
+                     * np.asarray(coverage, dtype=float) * 1e3)
+    return scale + np.asarray(ln_k) / np.log(10)
+
+
+def tafel_slopes(beta, temperature=298.15):
+    """Local Tafel slope |dU/dlog10 j| (mV/dec) for symmetry factors beta; inf where beta = 0."""
+    with np.errstate(divide='ignore'):
+        return np.log(10) * K_B * temperature / np.abs(np.asarray(beta, dtype=float)) * 1e3
+
+
+@profiled('post')
+def kinetics(e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, er, d, u, area, u_pzc, g_solv=0.0,
+             faradaic=True, temperature=298.15, prefactor=None, n_electrons=1, site_density=SITE_DENSITY,
+             coverage=1.0, clip_barrier=True, e_vac=E_VAC):
+    """
+    Barriers, rate constants, currents and Tafel slopes on the (reaction, er, d, U) grid.
+
+    Takes the inputs of agcdft.edl_terms() plus the kinetic constants.
+    n_electrons and coverage broadcast against the (R, E, D, U) grid.
+
+    Returns
+    -------
+    dict of arrays, shape (R, E, D, U)
+        'g_2c' (eV), 'beta', 'ln_k' (k in s^-1), 'log10_j' (j in mA/cm^2)
+        and 'tafel' (mV/dec).
+    """
+    poly = edl_polynomials(e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, er, d, area, u_pzc,
+                           g_solv=g_solv, faradaic=faradaic, e_vac=e_vac, reference='she')['2c'][..., None, :]
+    u = np.atleast_1d(np.asarray(u, dtype=float))
+    c2, c1, c0 = poly[..., 0], poly[..., 1], poly[..., 2]
+    g = (c2 * u + c1) * u + c0
+    beta = 2 * c2 * u + c1
+    ln_k = log_rate_constants(g, temperature, prefactor, clip_barrier)
+    if clip_barrier:
+        beta = np.where(g > 0, beta, 0.0)
+    return {'g_2c': g, 'beta': beta, 'ln_k': ln_k,
+            'log10_j': log_current(ln_k, n_electrons, site_density, coverage),
+            'tafel': tafel_slopes(beta, temperature)}
+
+
+def kinetics_dataset(data, er, d, u, terms=KINETIC_TERMS, **kwargs):
+    """kinetics() for every reaction of a loaded dataset, as an EDLResult with the requested terms."""
+    res = kinetics(er=er, d=d, u=u, **kernel_inputs(data), **kwargs)
+    values = np.stack([res[t] for t in terms], axis=-1)
+    attrs = {k: v for k, v in kwargs.items() if np.isscalar(v)}
+    return EDLResult(values, data['M'], er, d, u, terms, attrs=attrs)
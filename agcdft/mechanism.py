@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-step mechanisms: cumulative free-energy diagrams, potential-determining
+and rate-limiting steps on the (er, d, U) grid
+
+A mechanism chains elementary steps into pathways. Every step points at rows
+of a reaction sheet (agcdft.load_reactions()) by name:
+
+    {
+      "steps": {
+        "CO-COH":  {"reaction": "CO-COH dG", "barrier": "O-H", "faradaic": true},
+        "CO-OCCO": {"barrier": "OC-CO", "faradaic": false}
+      },
+      "pathways": {"COH": ["CO-COH", ...], "OCCO": ["CO-OCCO", ...]}
+    }
+
+'reaction' is the row giving the step free energy change (IS -> FS) and
+'barrier' the row giving its activation free energy (IS -> TS); either may be
+left out. Steps without a barrier row use max(dG, 0) and steps without a
+reaction row have an unknown dG (NaN), which only matters for the steps that
+follow them. 'faradaic' flags the step as an electrochemical or chemical
+step; if it is left out the sheet's Faradaic column (default True) is used,
+so no step is special-cased by its position.
+
+Mechanism.evaluate() runs every referenced row through Model 2C once and then
+gathers the steps of all pathways into padded (pathway, step, er, d, U)
+arrays, so the diagrams and step analyses of a whole network are array
+operations over the full grid.
+
+Steps may also list their 'reactants' and 'products' (adsorbates end in '*',
+'*' is a free site, e.g. ["CO*", "H+"] -> ["CHO*"]) for the steady-state
+solver in agcdft.microkinetics.
+"""
+
+import json
+
+import numpy as np
+
+from .dataset import kernel_inputs
+from .kernel import E_VAC, edl_terms_into
+from .profiling import profiled
+
+
+class Mechanism:
+    """
+    Elementary steps chained into pathways.
+
+    Parameters
+    ----------
+    steps : dict
+        Step name -> {'reaction': row name or None, 'barrier': row name or
+        None, 'faradaic': bool or None}, plus optional 'reactants' and
+        'products' species lists used by agcdft.microkinetics.
+    pathways : dict
+        Pathway name -> ordered list of step names.
+    """
+
+    def __init__(self, steps, pathways):
+        self.steps = {name: {'reaction': s.get('reaction'), 'barrier': s.get('barrier'),
+                             'faradaic': s.get('faradaic'), 'reactants': list(s.get('reactants', [])),
+                             'products': list(s.get('products', []))} for name, s in steps.items()}
+        self.pathways = {name: list(p) for name, p in pathways.items()}
+        for name, step in self.steps.items():
+            if step['reaction'] is None and step['barrier'] is None:
+                raise ValueError("step %r needs a reaction or a barrier row" % name)
+        for name, p in self.pathways.items():
+            unknown = [s for s in p if s not in self.steps]
+            if unknown:
+                raise KeyError("pathway %r uses undefined steps %s" % (name, unknown))
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(spec['steps'], spec['pathways'])
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as fh:
+            return cls.from_dict(json.load(fh))
+
+    def rows(self):
+        """Sheet rows referenced by the steps, in first-use order."""
+        out = []
+        for step in self.steps.values():
+            for key in ('reaction', 'barrier'):
+                if step[key] is not None and step[key] not in out:
+                    out.append(step[key])
+        return out
+
+    def faradaic(self, data):
+        """
+        Faradaic flag of every row of a sheet: the step flag where a step
+        sets one, otherwise the sheet's Faradaic column (default True).
+        """
+        names = [str(m) for m in data['M']]
+        flags = np.array(data.get('Faradaic', np.ones(len(names), dtype=bool)), dtype=bool)
+        source = {}
+        for step_name, step in self.steps.items():
+            if step['faradaic'] is None:
+                continue
+            for key in ('reaction', 'barrier'):
+                row = step[key]
+                if row is None:
+                    continue
+                if row not in names:
+                    raise KeyError("step %r refers to row %r, which is not in the sheet" % (step_name, row))
+                if row in source and source[row][1] != bool(step['faradaic']):
+                    raise ValueError("steps %r and %r disagree on whether row %r is faradaic"
+                                     % (source[row][0], step_name, row))
+                source[row] = (step_name, bool(step['faradaic']))
+                flags[names.index(row)] = bool(step['faradaic'])
+        return flags
+
+    @profiled('kernel', 'Mechanism.step_energies')
+    def step_energies(self, data, er, d, u, e_vac=E_VAC):
+        """
+        Free energy change and barrier of every step on the (er, d, U) grid.
+
+        Every referenced row goes through Model 2C once, with the faradaic
+        flags of faradaic().
+
+        Returns
+        -------
+        dict
+            'steps' (N,) step names; 'dg' and 'barrier' (N, E, D, U) in eV,
+            dG NaN for steps without a reaction row and barrier max(dG, 0)
+            for steps without a barrier row.
+        """
+        names = [str(m) for m in data['M']]
+        rows = self.rows()
+        missing = [r for r in rows if r not in names]
+        if missing:
+            raise KeyError("rows %s are not in the sheet" % missing)
+        take = np.array([names.index(r) for r in rows])
+        inputs = {k: np.broadcast_to(np.asarray(v), (len(names),))[take] for k, v in kernel_inputs(data).items()}
+        inputs['faradaic'] = self.faradaic(data)[take]
+        g = np.empty((len(rows), np.size(er), np.size(d), np.size(u), 1))
+        g = edl_terms_into(g, ('g_2c',), er=er, d=d, u=u, e_vac=e_vac, **inputs)[..., 0] # (rows, E, D, U)
+        unknown = np.full(g.shape[1:], np.nan)
+        dg, barrier = [], []
+        for step in self.steps.values():
+            dg.append(g[rows.index(step['reaction'])] if step['reaction'] is not None else unknown)
+            barrier.append(g[rows.index(step['barrier'])] if step['barrier'] is not None else np.maximum(dg[-1], 0.0))
+        return {'steps': np.array(list(self.steps), dtype=str), 'dg': np.array(dg), 'barrier': np.array(barrier)}
+
+    @profiled('post', 'Mechanism.evaluate')
+    def evaluate(self, data, er, d, u, e_vac=E_VAC):
+        """
+        Free-energy diagrams and step analysis of every pathway.
+
+        Parameters
+        ----------
+        data : dict
+            Reaction sheet from agcdft.load_reactions().
+        er, d, u : array_like
+            Dielectric constants, EDL widths (A) and potentials (V-SHE).
+
+        Returns
+        -------
+        dict
+            'pathways' (P,) and 'steps' (P, S) names ('' pads shorter pathways);
+            'dg' and 'barrier' (P, S, E, D, U) per step (eV, NaN padded);
+            'levels' (P, S + 1, E, D, U) cumulative intermediate energies
+            from the first initial state; 'ts' (P, S, E, D, U) transition
+            state energies on the same scale;
+            'pds' / 'pds_dg' (P, E, D, U) index and dG of the
+            potential-determining step (largest dG);
+            'rls' / 'rls_barrier' (P, E, D, U) index and effective barrier of
+            the rate-limiting step, the highest transition state measured
+            from the lowest intermediate before it;
+            'preferred' (E, D, U) index of the pathway with the lowest
+            rate-limiting barrier.
+        """
+        energies = self.step_energies(data, er, d, u, e_vac)
+        grid = energies['dg'].shape[1:]
+        # Padding step (index N) with NaN energies for shorter pathways
+        pad = np.full((1,) + grid, np.nan)
+        g_dg, g_barrier = np.concatenate([energies['dg'], pad]), np.concatenate([energies['barrier'], pad])
+        step_of = {s: i for i, s in enumerate(self.steps)}
+
+        p_names = list(self.pathways)
+        n_steps = max((len(p) for p in self.pathways.values()), default=0)
+        steps = np.full((len(p_names), n_steps), '', dtype=object)
+        index = np.full((len(p_names), n_steps), len(step_of))
+        for i, p in enumerate(p_names):
+            for j, s in enumerate(self.pathways[p]):
+                steps[i, j] = s
+                index[i, j] = step_of[s]
+        used = steps != ''
+        mask = used.reshape(used.shape + (1,) * len(grid))
+        dg, barrier = g_dg[index], g_barrier[index]
+
+        levels = np.concatenate([np.zeros((len(p_names), 1) + grid), np.cumsum(np.where(mask, dg, 0.0), axis=1)], axis=1)
+        # An unknown dG leaves every later level unknown
+        unknown = np.cumsum(np.isnan(dg) & mask, axis=1) > 0
+        levels[:, 1:] = np.where(unknown | ~mask, np.nan, levels[:, 1:])
+        ts = levels[:, :-1] + barrier
+        lowest_before = np.fmin.accumulate(levels[:, :-1], axis=1)
+        span = ts - lowest_before
+
+        with np.errstate(invalid='ignore'):
+            pds = _nanargmax(dg, axis=1)
+            rls = _nanargmax(span, axis=1)
+            rls_barrier = np.take_along_axis(span, np.maximum(rls, 0)[:, None], axis=1)[:, 0]
+            rls_barrier = np.where(rls >= 0, rls_barrier, np.nan)
+            pds_dg = np.where(pds >= 0, np.take_along_axis(dg, np.maximum(pds, 0)[:, None], axis=1)[:, 0], np.nan)
+        return {'pathways': np.array(p_names, dtype=str), 'steps': steps.astype(str), 'dg': dg, 'barrier': barrier,
+                'levels': levels, 'ts': ts, 'pds': pds, 'pds_dg': pds_dg, 'rls': rls, 'rls_barrier': rls_barrier,
+                'preferred': _nanargmax(-rls_barrier, axis=0)}
+
+
+def _nanargmax(x, axis):
+    """argmax ignoring NaN, -1 where every entry is NaN."""
+    nan = np.isnan(x)
+    idx = np.argmax(np.where(nan, -np.inf, x), axis=axis)
+    return np.where(nan.all(axis=axis), -1, idx)
+
+
+def load_mechanism(path):
+    """Mechanism from a JSON description."""
+    return Mechanism.from_json(path)
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Mean-field steady-state microkinetics with G_2C barriers as rate constants
+
+Every step of an agcdft.Mechanism that lists its 'reactants' and 'products'
+becomes an elementary reaction with
+
+    k_f = A*exp(-G_f/kT),   k_r = k_f*exp(dG/kT),   G_f = max(G_barrier, dG, 0)
+
+(A = kT/h by default), dG and G_barrier being the Model 2C energies of the
+step at each (er, d, U). Rates are mass-action in the coverages of the
+surface species (names ending in '*', '*' itself a free site) and in the
+fixed activities of everything else (default 1). The steady state solves
+d(theta)/dt = 0 with the site balance sum(theta) = 1 replacing the free-site
+equation.
+
+All (er, d) points of one potential are solved as a batch by pseudo-transient
+continuation: implicit Euler steps whose time step grows as the residual
+falls (switched evolution relaxation, at least doubling while it does
+not grow), so stiff networks start like a
+transient and finish like Newton's method. The first potential starts from
+a clean surface; every later one starts from the solution at the previous
+potential with a Newton-sized step, and any point that fails is solved again
+from a clean surface. Rates are normalized per point by the largest rate
+constant, so barriers of several eV neither underflow nor overflow.
+
+The degree of rate control X[t, i] = dln r_t/dln k_i (k_f and k_r of step i
+scaled together) comes from implicit differentiation of the steady state,
+one batched linear solve for all steps. Net rates that are small differences
+of large forward and reverse rates (near-equilibrated steps) carry the usual
+float64 cancellation error.
+"""
+
+import numpy as np
+
+from .kernel import E_VAC, K_B
+from .kinetics import log_rate_constants
+from .profiling import profiled
+
+
+def rate_network(mechanism, activities=None):
+    """
+    Stoichiometry of the steps of a mechanism.
+
+    Returns
+    -------
+    dict
+        'species' surface species names (S,), 'steps' (N,), 'nu' (S, N)
+        stoichiometric matrix, 'forward'/'reverse' lists of surface species
+        indices per step, 'ln_a_forward'/'ln_a_reverse' (N,) log products of
+        the fixed activities and 'site' the row replaced by the site balance.
+    """
+    activities = activities or {}
+    steps = list(mechanism.steps)
+    species = []
+    for name in steps:
+        step = mechanism.steps[name]
+        if not step['reactants'] and not step['products']:
+            raise ValueError("step %r lists no reactants or products" % name)
+        surface = [[s for s in step[side] if s.endswith('*')] for side in ('reactants', 'products')]
+        if len(surface[0]) != len(surface[1]):
+            raise ValueError("step %r does not conserve sites; balance it with free sites '*'" % name)
+        species += [s for s in surface[0] + surface[1] if s not in species]
+    index = {s: i for i, s in enumerate(species)}
+
+    nu = np.zeros((len(species), len(steps)))
+    forward, reverse, ln_f, ln_r = [], [], np.zeros(len(steps)), np.zeros(len(steps))
+    for j, name in enumerate(steps):
+        step = mechanism.steps[name]
+        for side, idx, ln_a, sign in (('reactants', forward, ln_f, -1), ('products', reverse, ln_r, 1)):
+            idx.append([index[s] for s in step[side] if s.endswith('*')])
+            for s in step[side]:
+                if s.endswith('*'):
+                    nu[index[s], j] += sign
+                else:
+                    ln_a[j] += np.log(activities.get(s, 1.0))
+    return {'species': np.array(species, dtype=str), 'steps': np.array(steps, dtype=str), 'nu': nu,
+            'forward': forward, 'reverse': reverse, 'ln_a_forward': ln_f, 'ln_a_reverse': ln_r,
+            'site': index.get('*', 0)}
+
+
+def _rates(theta, kf, kr, network):
+    """Net rates (M, N) and their coverage derivatives (M, N, S)."""
+    m, n = kf.shape
+    rate = np.empty((m, n))
+    drate = np.zeros((m, n, theta.shape[1]))
+    for j in range(n):
+        for k, idx, sign in ((kf[:, j], network['forward'][j], 1), (kr[:, j], network['reverse'][j], -1)):
+            factors = theta[:, idx]
+            term = k * np.prod(factors, axis=1)
+            rate[:, j] = term if sign == 1 else rate[:, j] - term
+            for p, s in enumerate(idx):
+                drate[:, j, s] += sign * k * np.prod(np.delete(factors, p, axis=1), axis=1)
+    return rate, drate
+
+
+def _system(theta, kf, kr, network):
+    """Steady-state residual (M, S) and its Jacobian (M, S, S), site balance in the site row."""
+    rate, drate = _rates(theta, kf, kr, network)
+    res = rate @ network['nu'].T
+    jac = np.einsum('sn,mnt->mst', network['nu'], drate)
+    res[:, network['site']] = theta.sum(axis=1) - 1
+    jac[:, network['site']] = 1.0
+    return res, jac, rate, drate
+
+
+def _solve(a, b):
+    """Batched a x = b, falling back to the pseudo-inverse for singular systems."""
+    try:
+        return np.linalg.solve(a, b)
+    except np.linalg.LinAlgError:
+        return np.linalg.pinv(a) @ b
+
+
+def steady_state(kf, kr, network, theta0, dt0=1e-6, tol=1e-14, max_iter=300):
+    """
+    Steady-state coverages of M rate-constant sets by pseudo-transient continuation.
+
+    Parameters
+    ----------
+    kf, kr : ndarray, shape (M, N)
+        Forward and reverse rate constants including fixed activities,
+        preferably normalized so the largest is ~1.
+    network : dict
+        From rate_network().
+    theta0 : ndarray, shape (M, S)
+        Starting coverages.
+    dt0 : float
+        Initial pseudo time step (in units of 1/max(k)); large values start
+        with Newton steps.
+
+    Returns
+    -------
+    theta (M, S), converged (M,) and iterations (M,).
+    """
+    theta = np.array(theta0, dtype=float)
+    m, s = theta.shape
+    dt = np.full(m, float(dt0))
+    converged = np.zeros(m, dtype=bool)
+    iterations = np.zeros(m, dtype=int)
+    transient = np.ones(s)
+    transient[network['site']] = 0.0 #The site balance has no time derivative
+    active = np.arange(m)
+    res, _, _, _ = _system(theta, kf, kr, network)
+    norm = np.abs(res).max(axis=1)
+
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        th = theta[active]
+        r, jac, _, _ = _system(th, kf[active], kr[active], network)
+        a = transient[None, :, None] * np.eye(s) / dt[active, None, None] - jac
+        a[:, network['site']] = 1.0
+        rhs = r.copy()
+        rhs[:, network['site']] = -r[:, network['site']]
+        step = _solve(a, rhs[..., None])[..., 0]
+        new = th + step
+        # Positivity: coverages that would go negative drop to a tenth instead
+        new = np.where(new < 0, 0.1 * th, new)
+        new_res, _, _, _ = _system(new, kf[active], kr[active], network)
+        new_norm = np.abs(new_res).max(axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(new_norm > 0, norm[active] / new_norm, 1e3)
+        # At least double the step while the residual does not grow (slow transients)
+        factor = np.where(ratio >= 1, np.clip(ratio, 2.0, 1e3), np.maximum(ratio, 0.1))
+        dt[active] = np.clip(dt[active] * factor, 1e-12, 1e14)
+        theta[active] = new
+        norm[active] = new_norm
+        iterations[active] += 1
+        done = (new_norm < tol) & (np.abs(new - th).max(axis=1) < np.sqrt(tol)) | ~np.isfinite(new_norm)
+        converged[active[done]] = np.isfinite(new_norm[done])
+        active = active[~done]
+    return theta, converged, iterations
+
+
+def rate_control(theta, kf, kr, network):
+    """
+    Steady-state net rates (M, N) and degrees of rate control X (M, N, N),
+    X[:, t, i] = dln r_t/dln k_i at fixed equilibrium constants; NaN where r_t = 0.
+    """
+    _, jac, rate, drate = _system(theta, kf, kr, network)
+    # d(residual)/dln k_i = nu[:, i]*r_i, zero in the site balance row
+    b = network['nu'][None] * rate[:, None, :]
+    b[:, network['site']] = 0.0
+    dtheta = -_solve(jac, b) # (M, S, N)
+    drate_dlnk = np.einsum('mts,msi->mti', drate, dtheta) + rate[:, :, None] * np.eye(rate.shape[1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drc = np.where(rate[:, :, None] != 0, drate_dlnk / rate[:, :, None], np.nan)
+    return rate, drc
+
+
+@profiled('post')
+def microkinetics(mechanism, data, er, d, u, activities=None, temperature=298.15, prefactor=None,
+                  tol=1e-14, max_iter=300, e_vac=E_VAC):
+    """
+    Steady-state coverages, rates and degree of rate control on the (er, d, U) grid.
+
+    Parameters
+    ----------
+    mechanism : agcdft.Mechanism
+        Every step needs a reaction row and its reactants and products.
+    data : dict
+        Reaction sheet from agcdft.load_reactions().
+    er, d, u : array_like
+        Dielectric constants, EDL widths (A) and potentials (V-SHE); points
+        are warm-started along u in the order given.
+    activities : dict, optional
+        Activity of every non-surface species (default 1).
+
+    Returns
+    -------
+    dict
+        'species' (S,), 'steps' (N,), 'coverage' (S, E, D, U), 'rate'
+        (N, E, D, U) net turnover per site (s^-1), 'drc' (N, N, E, D, U)
+        with drc[t, i] the degree of rate control of step i on the rate of
+        step t, 'converged' and 'iterations' (E, D, U).
+    """
+    network = rate_network(mechanism, activities)
+    energies = mechanism.step_energies(data, er, d, u, e_vac)
+    unknown = [s for s, g in zip(energies['steps'], energies['dg']) if np.isnan(g).all()]
+    if unknown:
+        raise ValueError("steps %s need a reaction row for their reverse rates" % unknown)
+
+    kt = K_B * temperature
+    dg = np.moveaxis(energies['dg'], 0, -1) # (E, D, U, N)
+    ln_kf = log_rate_constants(np.maximum(energies['barrier'], energies['dg']), temperature, prefactor)
+    ln_kf = np.moveaxis(ln_kf, 0, -1)
+    ln_kr = ln_kf + dg / kt + network['ln_a_reverse']
+    ln_kf = ln_kf + network['ln_a_forward']
+    grid = dg.shape[:-1]
+    n_u = grid[-1]
+    ln_kf, ln_kr = ln_kf.reshape(-1, n_u, dg.shape[-1]), ln_kr.reshape(-1, n_u, dg.shape[-1])
+    shift = np.maximum(ln_kf.max(axis=-1), ln_kr.max(axis=-1)) # (M, U)
+
+    s, n = len(network['species']), len(network['steps'])
+    clean = np.zeros((ln_kf.shape[0], s))
+    clean[:, network['site']] = 1.0
+    theta = np.empty((ln_kf.shape[0], n_u, s))
+    rate = np.empty((ln_kf.shape[0], n_u, n))
+    drc = np.empty((ln_kf.shape[0], n_u, n, n))
+    converged = np.zeros((ln_kf.shape[0], n_u), dtype=bool)
+    iterations = np.zeros((ln_kf.shape[0], n_u), dtype=int)
+    for j in range(n_u):
+        kf = np.exp(ln_kf[:, j] - shift[:, j, None])
+        kr = np.exp(ln_kr[:, j] - shift[:, j, None])
+        if j == 0:
+            th, ok, it = steady_state(kf, kr, network, clean, tol=tol, max_iter=max_iter)
+        else:
+            th, ok, it = steady_state(kf, kr, network, theta[:, j - 1], dt0=1e8, tol=tol, max_iter=max_iter)
+            if not ok.all(): #Cold restart where the warm start failed
+                retry = ~ok
+                th[retry], ok[retry], extra = steady_state(kf[retry], kr[retry], network, clean[retry],
+                                                           tol=tol, max_iter=max_iter)
+                it[retry] += extra
+        r, x = rate_control(th, kf, kr, network)
+        theta[:, j], converged[:, j], iterations[:, j], drc[:, j] = th, ok, it, x
+        rate[:, j] = r * np.exp(shift[:, j, None])
+
+    return {'species': network['species'], 'steps': network['steps'],
+            'coverage': np.moveaxis(theta.reshape(grid + (s,)), -1, 0),
+            'rate': np.moveaxis(rate.reshape(grid + (n,)), -1, 0),
+            'drc': np.moveaxis(drc.reshape(grid + (n, n)), (-2, -1), (0, 1)),
+            'converged': converged.reshape(grid), 'iterations': iterations.reshape(grid)}
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Closed-form onset/limiting potentials from the Model 1B-2C polynomials
+
+G_2C is an exact quadratic in U' (agcdft.kernel.edl_polynomials):
+
+    G_2C(U') = p_2*U'^2 + p_1*U' + p_0
+
+so the potential where it reaches a level (0 for a limiting potential, or a
+target barrier for an onset potential) follows from the quadratic formula on
+the whole (reaction, er, d) grid at once. Of the two roots, the one returned
+is the branch that connects to the linear root -p_0/p_1 as the polarizability
+term p_2 goes to 0, i.e. the root Models 1B-2B would predict corrected for
+polarizability. It is evaluated as
+
+    q = -(p_1 + sign(p_1)*sqrt(p_1^2 - 4*p_2*p_0))/2,   U' = p_0/q
+
+which avoids the cancellation of the textbook formula when p_2 is small.
+The other root, q/p_2, lies far outside the window for typical polarizability
+changes. Entries without a real root (negative discriminant) are NaN.
+"""
+
+import numpy as np
+
+from .dataset import kernel_inputs
+from .kernel import E_VAC, edl_polynomials
+from .profiling import profiled
+
+
+def quadratic_roots(coeffs, level=0.0):
+    """
+    Roots of c[0]*x^2 + c[1]*x + c[2] = level, vectorized over leading axes.
+
+    Parameters
+    ----------
+    coeffs : array_like, shape (..., 3) or (..., 2)
+        Polynomial coefficients, highest power first. Linear polynomials
+        are solved directly.
+    level : float or array_like
+        Value the polynomial should reach, broadcast against coeffs[..., 0].
+
+    Returns
+    -------
+    dict
+        'root': branch connected to the linear root -c[2]/c[1],
+        'other': the second root (NaN for linear or degenerate cases),
+        'discriminant': c[1]^2 - 4*c[0]*(c[2] - level).
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+    if coeffs.shape[-1] == 2:
+        b, c = coeffs[..., 0], coeffs[..., 1] - level
+        with np.errstate(divide='ignore', invalid='ignore'):
+            root = np.where(b != 0, -c / b, np.nan)
+        return {'root': root, 'other': np.full_like(root, np.nan), 'discriminant': b ** 2}
+
+    a, b, c = coeffs[..., 0], coeffs[..., 1], coeffs[..., 2] - level
+    disc = b ** 2 - 4 * a * c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = -0.5 * (b + np.where(b >= 0, 1.0, -1.0) * np.sqrt(disc))
+        root = np.where(q != 0, c / q, np.where(c == 0, 0.0, np.nan))
+        other = np.where(a != 0, q / a, np.nan)
+    real = disc >= 0
+    return {'root': np.where(real, root, np.nan), 'other': np.where(real, other, np.nan), 'discriminant': disc}
+
+
+@profiled('post')
+def onset_potentials(e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, er, d, area, u_pzc,
+                     g_solv=0.0, faradaic=True, level=0.0, model='2c', reference='she', e_vac=E_VAC):
+    """
+    Potential at which G of each reaction reaches ``level``, shape (R, E, D).
+
+    Takes the per-reaction inputs of agcdft.edl_terms() without a potential
+    grid. level=0 gives the limiting potential of a thermodynamic step (or
+    where a barrier vanishes); a positive level gives the onset potential at
+    which the barrier drops to that value.
+
+    Parameters
+    ----------
+    model : {'1b', '2a', '2b', '2c'}
+        Model whose polynomial is solved; 1B-2B are linear.
+    reference : {'she', 'pzc'}
+        Return U (V-SHE) or U' = U - U_pzc.
+
+    Returns
+    -------
+    dict
+        'u' (V), 'u_other' (second 2C root) and 'discriminant' as in
+        quadratic_roots(), plus 'beta', the slope dG/dU at 'u'.
+    """
+    poly = edl_polynomials(e_in, e_fin, dm_in, dm_fin, polar_in, polar_fin, er, d, area, u_pzc,
+                           g_solv=g_solv, faradaic=faradaic, e_vac=e_vac, reference=reference)[model]
+    roots = quadratic_roots(poly, level)
+    if poly.shape[-1] == 3:
+        beta = 2 * poly[..., 0] * roots['root'] + poly[..., 1]
+    else:
+        beta = np.where(np.isfinite(roots['root']), poly[..., 0], np.nan)
+    return {'u': roots['root'], 'u_other': roots['other'], 'discriminant': roots['discriminant'], 'beta': beta}
+
+
+def onset_dataset(data, er, d, level=0.0, model='2c', reference='she', e_vac=E_VAC):
+    """onset_potentials() for every reaction of a dataset from agcdft.load_reactions()."""
+    return onset_potentials(er=er, d=d, level=level, model=model, reference=reference, e_vac=e_vac,
+                            **kernel_inputs(data))
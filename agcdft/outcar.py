@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming OUTCAR extractor (Python replacement for bash scripts/getenergies)
+
+Each OUTCAR is memory-mapped and searched from the end, so only the last
+ionic step is read no matter how large the file is. For every calculation
+folder this collects:
+
+1. Energy: last 'energy  without entropy' line, energy(sigma->0) as in getenergies (eV)
+2. Dipole moment: last 'dipolmoment' line, component along IDIPOL (eA)
+3. E-fermi: last 'E-fermi' line (eV)
+4. Vacuum potential: maximum of the planar-averaged LOCPOT (LVHAR = .TRUE.), if present (V-abs)
+5. Area: surface area |a x b| from CONTCAR (or POSCAR) (A^2)
+
+state_rows() pairs initial and final states into rows of the reaction
+template (M, E_In, DM_In, ..., Area, Upzc), which write_rows() saves as CSV
+for agcdft.dataset.load_reactions().
+"""
+
+import csv
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .kernel import VAC_NHE
+
+TEMPLATE_COLUMNS = ('M', 'E_In', 'DM_In', 'Polar_In', 'G_Solv', 'E_Fin', 'DM_Fin', 'Polar_Fin',
+                    'Polar_Bare', 'Area', 'Upzc')
+
+
+def _last_line(mm, key):
+    """Last line of a memory-mapped file containing key, or None."""
+    pos = mm.rfind(key)
+    if pos < 0:
+        return None
+    end = mm.find(b'\n', pos)
+    start = mm.rfind(b'\n', 0, pos) + 1
+    return mm[start:end if end >= 0 else len(mm)].decode(errors='replace')
+
+
+def read_outcar(path, idipol=3):
+    """
+    Final energy, dipole moment and Fermi energy of one OUTCAR.
+
+    Missing quantities are NaN. idipol selects the dipole component
+    (1, 2 or 3 for x, y or z), matching IDIPOL in the INCAR.
+    """
+    out = {'energy': np.nan, 'dipole': np.nan, 'e_fermi': np.nan}
+    if os.path.getsize(path) == 0:
+        return out
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        line = _last_line(mm, b'energy  without entropy')
+        if line:
+            out['energy'] = float(line.split()[-1])
+        line = _last_line(mm, b'dipolmoment')
+        if line:
+            out['dipole'] = float(line.split()[idipol])
+        line = _last_line(mm, b'E-fermi')
+        if line:
+            out['e_fermi'] = float(line.split()[2])
+    return out
+
+
+def surface_area(path):
+    """|a x b| of the cell in a POSCAR/CONTCAR (A^2)."""
+    with open(path) as fh:
+        lines = [fh.readline() for _ in range(5)]
+    scale = float(lines[1].split()[0])
+    a, b = (np.array(lines[i].split()[:3], dtype=float) * scale for i in (2, 3))
+    return float(np.linalg.norm(np.cross(a, b)))
+
+
+def locpot_vacuum(path):
+    """Vacuum potential: maximum of the xy-averaged LOCPOT along z (V-abs)."""
+    with open(path) as fh:
+        for _ in range(5):
+            fh.readline()
+        line = fh.readline().split()
+        counts = line if line[0].isdigit() else fh.readline().split() #VASP 5 species line
+        n_atoms = sum(int(i) for i in counts)
+        line = fh.readline()
+        if line.strip()[0] in 'sS': #Selective dynamics
+            fh.readline()
+        for _ in range(n_atoms):
+            fh.readline()
+        line = fh.readline()
+        while not line.strip():
+            line = fh.readline()
+        ngx, ngy, ngz = (int(i) for i in line.split())
+        values, n = [], ngx * ngy * ngz
+        while n > 0:
+            row = fh.readline().split()
+            values.extend(row)
+            n -= len(row)
+    grid = np.asarray(values[:ngx * ngy * ngz], dtype=float).reshape((ngz, ngy, ngx))
+    return float(grid.mean(axis=(1, 2)).max())
+
+
+def read_state(folder, idipol=3, locpot=True):
+    """All quantities of one calculation folder, NaN where files are missing."""
+    row = {'name': os.path.basename(os.path.normpath(folder)), 'folder': folder,
+           'energy': np.nan, 'dipole': np.nan, 'e_fermi': np.nan, 'u_vac': np.nan, 'area': np.nan}
+    outcar = os.path.join(folder, 'OUTCAR')
+    if os.path.isfile(outcar):
+        row.update(read_outcar(outcar, idipol))
+    for name in ('CONTCAR', 'POSCAR'):
+        poscar = os.path.join(folder, name)
+        if os.path.isfile(poscar) and os.path.getsize(poscar) > 0:
+            row['area'] = surface_area(poscar)
+            break
+    if locpot and os.path.isfile(os.path.join(folder, 'LOCPOT')):
+        row['u_vac'] = locpot_vacuum(os.path.join(folder, 'LOCPOT'))
+    row['wf'] = row['u_vac'] - row['e_fermi'] #Work function (eV)
+    return row
+
+
+def find_calculations(root, recursive=False):
+    """Folders below root that hold an OUTCAR (direct subfolders unless recursive)."""
+    if recursive:
+        return sorted(dirpath for dirpath, _, files in os.walk(root) if 'OUTCAR' in files)
+    return sorted(os.path.join(root, i) for i in os.listdir(root)
+                  if os.path.isfile(os.path.join(root, i, 'OUTCAR')))
+
+
+def extract_states(folders, idipol=3, locpot=True, workers=None):
+    """read_state() for many folders on a process pool, keyed by folder name."""
+    folders = list(folders)
+    if workers == 1 or len(folders) < 2:
+        rows = [read_state(f, idipol, locpot) for f in folders]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(read_state, folders, [idipol] * len(folders), [locpot] * len(folders),
+                                 chunksize=max(1, len(folders) // (4 * (workers or os.cpu_count() or 1)))))
+    # Key on the path below the common parent so nested runs (e.g. field/0.1) stay unique
+    root = os.path.commonpath([os.path.abspath(f) for f in folders]) if len(folders) > 1 else None
+    for row in rows:
+        if root is not None:
+            row['name'] = os.path.relpath(os.path.abspath(row['folder']), root)
+    return {row['name']: row for row in rows}
+
+
+def state_rows(states, reactions, bare, polar=None, g_solv=None, vac_nhe=VAC_NHE):
+    """
+    Rows of the reaction template from extracted states.
+
+    Parameters
+    ----------
+    states : dict
+        Output of extract_states().
+    reactions : dict
+        Reaction name -> (initial state name, final state name).
+    bare : str
+        Name of the bare-surface state. Its work function gives
+        Upzc = WF - vac_nhe and its cell gives Area.
+    polar : dict, optional
+        State name -> polarizability (eA^2V^-1), e.g. from
+        agcdft.polarizability. Missing states are left as NaN.
+    g_solv : dict, optional
+        Reaction name -> solvation free energy change (eV), default 0.
+    """
+    polar = polar or {}
+    g_solv = g_solv or {}
+    surface = states[bare]
+    rows = []
+    for m, (initial, final) in reactions.items():
+        rows.append({
+            'M': m,
+            'E_In': states[initial]['energy'], 'DM_In': states[initial]['dipole'],
+            'Polar_In': polar.get(initial, np.nan), 'G_Solv': g_solv.get(m, 0.0),
+            'E_Fin': states[final]['energy'], 'DM_Fin': states[final]['dipole'],
+            'Polar_Fin': polar.get(final, np.nan), 'Polar_Bare': polar.get(bare, np.nan),
+            'Area': surface['area'], 'Upzc': surface['wf'] - vac_nhe,
+        })
+    return rows
+
+
+def write_rows(rows, path):
+    """Write template rows to a CSV that agcdft.dataset.load_reactions() reads."""
+    with open(path, 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=TEMPLATE_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Final energy, dipole, E-fermi and vacuum potential of VASP runs')
+    parser.add_argument('folder', help='folder whose subfolders hold OUTCARs')
+    parser.add_argument('-r', '--recursive', action='store_true', help='search all subfolders')
+    parser.add_argument('--idipol', type=int, default=3, help='dipole component (IDIPOL), default 3')
+    parser.add_argument('--no-locpot', action='store_true', help='skip reading LOCPOT files')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes')
+    args = parser.parse_args()
+
+    found = extract_states(find_calculations(args.folder, args.recursive), args.idipol,
+                           not args.no_locpot, args.workers)
+    print('name,energy,dipole,e_fermi,u_vac,wf,area')
+    for name, row in found.items():
+        print('%s,%.6f,%.6f,%.4f,%.4f,%.4f,%.4f' % (name, row['energy'], row['dipole'], row['e_fermi'],
+                                                     row['u_vac'], row['wf'], row['area']))
@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""
+Figures drawn from computed aGC-DFT results, kept off the compute path
+
+Every figure is a module-level function that takes arrays or an EDLResult and
+returns a matplotlib Figure. Scripts only queue (name, function, kwargs) jobs
+and hand them to render_figures(), which either
+
+1. skips plotting entirely (target=None),
+2. draws the figures in-process and shows them (target='show'), or
+3. saves them into a folder with the Agg backend, rendering several figures
+   at once on a process pool (target='<folder>').
+
+matplotlib and seaborn are only imported when a figure is drawn, so the math
+never waits on figure layout and batch runs can skip it altogether.
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .profiling import profiled, stage
+
+D_LINESTYLES = {3: '-', 4.5: 'dashed', 6: '-.'} #Line style of each EDL width, ':' otherwise
+
+
+def _pyplot():
+    import matplotlib
+    if 'matplotlib.pyplot' not in sys.modules:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _frame(ax, linewidth=5):
+    """Black box, inward ticks on all sides, as in the published figures."""
+    ax.xaxis.set_ticks_position('both')
+    ax.yaxis.set_ticks_position('both')
+    for side in ('top', 'right', 'bottom', 'left'):
+        ax.spines[side].set_linewidth(4)
+    ax.set_facecolor('white')
+    ax.patch.set_edgecolor('black')
+    ax.patch.set_linewidth(linewidth)
+
+
+# %% Figures
+
+def plot_g_2c(result, reaction):
+    """G_2C vs U for every (er, d) of one reaction."""
+    return plot_curves(result, reaction, 'g_2c', "$\\Delta$G$_{2C}$ (eV)")
+
+
+def plot_curves(result, reaction, term, ylabel):
+    """Any term of an EDLResult vs U for every (er, d) of one reaction."""
+    plt = _pyplot()
+    import seaborn as sns
+
+    er_values, d_values, u = result.coords['er'], result.coords['d'], result.coords['u']
+    values = result.sel(reaction=reaction, term=term)
+    colors = sns.color_palette('Blues', n_colors=len(er_values) * len(d_values))
+
+    fig, ax = plt.subplots(figsize=(12, 10))
+    for j, er_val in enumerate(er_values):
+        for k, d_val in enumerate(d_values):
+            ax.plot(u, values[j, k], label=fr"e$_r$={er_val:g}, d={d_val:g}", linewidth=5,
+                    color=colors[j * len(d_values) + k], linestyle=D_LINESTYLES.get(d_val, ':'))
+    ax.set_xlabel("U (V-SHE)", fontweight='bold', fontsize=32)
+    ax.set_ylabel(ylabel, fontweight='bold', fontsize=32)
+    ax.set_title(reaction, fontweight='bold', fontsize=32)
+    ax.tick_params(axis='both', labelsize=28, width=4, colors='black', direction="in", which='major', length=10, pad=15)
+    _frame(ax)
+    ax.legend(fontsize=14, loc=(1.01, 0.0))
+    fig.tight_layout()
+    return fig
+
+
+def compartment_bars(result, m_values, volts, u_pzc, faradaic=True, stack_on=None):
+    """
+    Stacked bars of G_1A, |e|U', capacitive, dipole-field and polarizability
+    contributions at two potentials (Figure 3 of the JPCC paper).
+
+    Parameters
+    ----------
+    result : EDLResult
+        Needs the terms g_1a, c_total, dm_total, p_total and g_2c.
+    m_values : dict
+        Reaction name -> {'er': ..., 'd': ...} to show for that reaction.
+    volts : sequence of 2 floats
+        Potentials (V-SHE); the first is drawn faded, the second solid.
+    faradaic : bool or sequence of bool
+        Reactions without an |e|U' bar (chemical steps) are False.
+    stack_on : sequence of str, optional
+        What the EDL bars of each reaction are stacked on: 'u_prime', 'g_1a'
+        or 'zero'. By default chemical steps stack on zero and faradaic steps
+        on G_1A when their EDL terms raise the barrier at the second
+        potential, on |e|U' when they lower it.
+    """
+    plt = _pyplot()
+    import seaborn as sns
+
+    u = result.coords['u']
+    indexv = [np.argmin(np.abs(u - volt)) for volt in volts]
+    faradaic = np.broadcast_to(faradaic, (len(m_values),))
+    u_prime_1 = [(volts[0] - u_pzc) * f for f in faradaic]
+    u_prime_2 = [(volts[1] - u_pzc) * f for f in faradaic]
+
+    # Values at the two potentials for the er and d of each reaction
+    vals = {term: [result.sel(reaction=m, er=m_values[m]['er'], d=m_values[m]['d'], term=term)[indexv]
+                   for m in m_values]
+            for term in ('g_1a', 'c_total', 'dm_total', 'p_total', 'g_2c')}
+    g_1a_1, c_1, dm_1, p_1, g_2c_1 = ([v[0] for v in vals[t]] for t in ('g_1a', 'c_total', 'dm_total', 'p_total', 'g_2c'))
+    g_1a_2, c_2, dm_2, p_2, g_2c_2 = ([v[1] for v in vals[t]] for t in ('g_1a', 'c_total', 'dm_total', 'p_total', 'g_2c'))
+    if stack_on is None:
+        stack_on = ['zero' if not f else 'g_1a' if c + dm + p >= 0 else 'u_prime'
+                    for f, c, dm, p in zip(faradaic, c_2, dm_2, p_2)]
+
+    bar_width = 0.35
+    index = np.arange(len(m_values))
+    colors = sns.color_palette('deep', n_colors=9)
+    fig, ax = plt.subplots(figsize=(24, 19))
+
+    # First potential (faded, shifted by the bar width)
+    ax.bar(index + bar_width, g_1a_1, bar_width, color=colors[1], alpha=0.5)
+    ax.bar(index + bar_width, u_prime_1, bar_width, color=colors[2], alpha=0.5)
+    ax.axhline(y=0, xmin=0, xmax=10, linewidth=5, alpha=0.9, color='black', linestyle='--')
+    ax.scatter(index + bar_width, g_2c_1, s=1000, label='Total Barrier at' + str(volts[0]) + 'V-SHE', color='white',
+               marker='o', edgecolor='black', linewidth=7)
+
+    # Second potential
+    ax.bar(index, g_1a_2, bar_width, label=r'$\Delta$G$^{‡o}$', color=colors[1], alpha=1)
+    ax.bar(index, u_prime_2, bar_width, color=colors[2], label='|e|U$^{\prime}$', alpha=1)
+    ax.scatter(index, g_2c_2, label='Total Barrier at' + str(volts[1]) + 'V-SHE', s=1000, color='white', marker='D',
+               alpha=1, edgecolor='black', linewidth=7, zorder=3200)
+
+    labelled = False
+    for i in range(len(m_values)):
+        base = {'u_prime': (u_prime_1[i], u_prime_2[i]), 'g_1a': (g_1a_1[i], g_1a_2[i]), 'zero': (0, 0)}[stack_on[i]]
+        labels = ('Capacitive', 'Dipole-Field', 'Polarizability') if stack_on[i] == 'g_1a' and not labelled else (None,) * 3
+        labelled = labelled or labels[0] is not None
+        for x, b, c, dm, p, alpha in ((index[i] + bar_width, base[0], c_1[i], dm_1[i], p_1[i], 0.5),
+                                      (index[i], base[1], c_2[i], dm_2[i], p_2[i], 1)):
+            names = labels if alpha == 1 else (None,) * 3 #Legend entries come from the solid bars
+            ax.bar(x, c, bar_width, bottom=b, color=colors[3], label=names[0], alpha=alpha)
+            ax.bar(x, dm, bar_width, bottom=b + c, color=colors[0], label=names[1], alpha=alpha)
+            ax.bar(x, p, bar_width, bottom=b + c + dm, color=colors[6], label=names[2], alpha=alpha)
+        if stack_on[i] == 'g_1a':
+            ax.text(index[i] - 0.5 + bar_width, g_1a_1[i] + c_1[i] + dm_1[i] + 0.25, str(volts[1]) + ' V', fontsize=36, fontweight='bold')
+            ax.text(index[i] + 0.225, g_1a_2[i] + c_2[i] + dm_2[i] - 0.1, str(volts[0]) + ' V', fontsize=36, fontweight='bold')
+        else:
+            ax.text(index[i] - 0.5 + bar_width, g_1a_1[i] + 0.1, str(volts[1]) + ' V', fontsize=36, fontweight='bold')
+            ax.text(index[i] + 0.225, g_1a_1[i] + 0.1, str(volts[0]) + ' V', fontsize=36, fontweight='bold')
+
+    ax.set_ylabel('Free Energy (eV)', fontsize=52, fontweight='bold')
+    ax.set_xticks(index)
+    ax.set_xticklabels(list(m_values), fontweight='bold')
+    ax.yaxis.set_ticks(np.arange(-2, 2.5, 0.5))
+    ax.set_ylim([-2, 2.25])
+    ax.yaxis.set_minor_locator(plt.MultipleLocator(0.1))
+    ax.tick_params(axis='both', labelsize=44, width=8, colors='black', direction="in", grid_color='black', which='major', length=20, pad=15)
+    ax.tick_params(axis='both', which='minor', length=12, width=5, direction='in')
+    _frame(ax, linewidth=8)
+
+    legend = ax.legend(loc='best', fontsize=32, bbox_to_anchor=(1.06, -0.1), borderaxespad=0, ncol=4, frameon=True,
+                       fancybox=True, framealpha=1, edgecolor='black', facecolor='white', labelspacing=0.5)
+    for text in legend.get_texts():
+        text.set_fontweight('bold')
+    legend.get_frame().set_linewidth(3)
+    return fig
+
+
+def sensitivity_panels(result, diff_dm, reactions=None, palettes=('Blues', 'flare', 'crest'),
+                       ylims=([0, 1.2], [0, 1.2], [.9, 1.05])):
+    """
+    G_2C vs U of each reaction for every (er, d) pair, one panel per reaction
+    (Figure 4 of the JPCC paper).
+
+    diff_dm holds the dipole change of each reaction in result (eA), printed
+    on its panel. reactions defaults to the first three reactions.
+    """
+    plt = _pyplot()
+    import seaborn as sns
+    from matplotlib.ticker import AutoMinorLocator
+
+    names = result.coords['reaction'].tolist()
+    reactions = names[:3] if reactions is None else list(reactions)
+    er_values, d_values, u = result.coords['er'], result.coords['d'], result.coords['u']
+    colors1 = sns.color_palette('deep', n_colors=30)
+    fig, axs = plt.subplots(1, len(reactions), figsize=(28 * len(reactions) / 3, 9), squeeze=False)
+    axs = axs[0]
+
+    for idx, m in enumerate(reactions):
+        g_2c_m = result.sel(reaction=m, term='g_2c') # (er, d, u)
+        colors = sns.color_palette(palettes[idx % len(palettes)], n_colors=len(er_values) * len(d_values))
+        for j, er_val in enumerate(er_values):
+            for k, d_val in enumerate(d_values):
+                axs[idx].plot(u, g_2c_m[j, k], label=fr"e$_r$={er_val:g}, d={d_val:g}", linewidth=5, alpha=1,
+                              color=colors[j * len(d_values) + k], linestyle=D_LINESTYLES.get(d_val, ':'))
+
+        axs[idx].text(0.24 if len(m) > 3 else 0.2, 0.92, m, transform=axs[idx].transAxes, fontsize=36, fontweight='bold',
+                      va='center', ha='center', c=colors1[idx])
+        axs[idx].text(0.07, 0.92, f'{chr(97 + idx)})', transform=axs[idx].transAxes, fontsize=36, fontweight='bold',
+                      va='center', ha='center')
+        axs[idx].text(.28, 0.84, fr'$\Delta\mu$ = {diff_dm[names.index(m)]:.2f} ' + r'e$\AA$', fontsize=36,
+                      ha='center', va='center', transform=axs[idx].transAxes)
+
+        axs[idx].set_xlabel("U (V-SHE)", fontweight='bold', fontsize=32)
+        axs[idx].set_ylabel("Activation Free Energy (eV)", fontweight='bold', fontsize=30)
+        axs[idx].set_xlim([-1.5, 0])
+        axs[idx].xaxis.set_ticks(np.arange(-1.5, 0.25, 0.25))
+        axs[idx].set_ylim(ylims[idx % len(ylims)])
+        axs[idx].tick_params(axis='both', labelsize=28, width=4, colors='black', direction="in", grid_color='black', which='major', length=10, pad=15)
+        axs[idx].tick_params(axis='both', which='minor', length=6, width=5, direction='in')
+        axs[idx].xaxis.set_minor_locator(AutoMinorLocator(2))
+        axs[idx].yaxis.set_minor_locator(AutoMinorLocator(1))
+        _frame(axs[idx])
+
+    fig.tight_layout()
+    return fig
+
+
+def beta_heatmap(beta, er_values, d_values, order=None):
+    """Heatmap of averaged symmetry factors on the (er, d) grid, rows in the given er order."""
+    plt = _pyplot()
+    import pandas as pd
+    import seaborn as sns
+
+    heatmap_data = pd.DataFrame(beta, index=list(er_values), columns=list(d_values))
+    if order is not None:
+        heatmap_data = heatmap_data.loc[list(order)]
+    heatmap_data = heatmap_data.rename_axis('', axis=1).rename_axis('', axis=0)
+    with stage('heatmap_format', 'plot'):
+        annot = heatmap_data.apply(lambda col: col.map(lambda x: f"{x:.2f}"))
+
+    fig = plt.figure(figsize=(10, 10))
+    ax = sns.heatmap(heatmap_data, annot=annot, cmap="Spectral", fmt="", linewidths=5,
+                     annot_kws={"weight": "bold", "size": 28, "color": "white"}, center=0.5)
+    cax = ax.figure.axes[-1]
+    cax.tick_params(labelsize=24)
+    for axis in ('x', 'y'):
+        ax.tick_params(axis=axis, labelsize=24, width=3, colors='black', direction="in", grid_color='black', which='major', length=4)
+    ax.set_xlabel('EDL Width (Å)', fontweight='bold', fontsize=24, labelpad=10)
+    ax.set_ylabel('Dielectric Constant', fontweight='bold', fontsize=24, labelpad=10)
+    ax.collections[0].set_clim(0, 1)
+    return fig
+
+
+def adsorption_profiles(results, xlim=None, ylim=None):
+    """
+    G_ads vs U-U_pzc for each (er, d) in a Barrier_E_and_d.py results dict,
+    {(er, d): {'u_prime': ..., 'g_2c': ...}}.
+    """
+    plt = _pyplot()
+    import seaborn as sns
+
+    colors = sns.color_palette('deep', n_colors=30)
+    styles = {3: dict(linewidth=5, offset=3), 3.5: dict(linewidth=7.5, linestyle=':', offset=2),
+              4: dict(linewidth=5, linestyle='dashdot', offset=1)}
+    fig = plt.figure(figsize=(18, 14))
+    ap2 = fig.add_subplot(111)
+    for i, ((er_val, d_val), data) in enumerate(results.items()):
+        if d_val in styles:
+            style = dict(styles[d_val])
+            offset = style.pop('offset')
+            ap2.plot(data['u_prime'], data['g_2c'], label=f'$\\epsilon_r$={er_val}, d={d_val}', color=colors[i + offset], **style)
+
+    ap2.set_xlabel("U-U$_{pzc}$ (V-NHE)", fontweight='bold', fontsize=56)
+    ap2.set_ylabel("$G_{ads}$ (eV)", fontweight='bold', fontsize=56)
+    ap2.legend(fontsize=32, loc=(1.01, 0.1), ncol=1)
+    if xlim is not None:
+        ap2.set_xlim(xlim)
+    if ylim is not None:
+        ap2.set_ylim(ylim)
+    for axis in ('x', 'y'):
+        ap2.tick_params(axis=axis, labelsize=42, width=4, colors='black', direction="in", grid_color='black', which='major', length=9, pad=25)
+        ap2.tick_params(axis=axis, which='minor', length=5, width=4, direction='in')
+    ap2.set_facecolor('white')
+    ap2.patch.set_edgecolor('black')
+    ap2.patch.set_linewidth(5)
+    fig.tight_layout()
+    return fig
+
+
+def model_profiles(u, TL, diff_dm, diff_polar, er, d, u_pzc):
+    """
+    Delta G vs U (V-SHE) of Models 1B-2C for one reaction, er and d, with
+    their equations (first figure of Barrier_EDL_Base.py).
+
+    TL holds the coefficients of each model in U from edl_polynomials()
+    (reference='she'), keyed '1b', '2a', '2b' and '2c', as 1D arrays.
+    """
+    plt = _pyplot()
+
+    models = (('1b', 'k', "Model 1B:No EDL"), ('2a', 'r', "Model 2A:C"), ('2b', 'b', r"Model 2B:C+$\mu$"),
+              ('2c', 'g', r"Model 2C:C+$\mu$+$\alpha$"))
+    fig = plt.figure(figsize=(12, 10))
+    ap2 = fig.add_subplot(111)
+    g_data = []
+    for key, color, label in models:
+        g_data.append(np.polyval(TL[key], u))
+        ap2.plot(u, g_data[-1], c=color, label=label, linewidth=5)
+    ap2.axhline(y=0, color='black', linestyle='--', alpha=0.9, linewidth=3)
+    ap2.set_facecolor('white')
+    ap2.patch.set_edgecolor('black')
+    ap2.patch.set_linewidth(5)
+    ap2.grid(False)
+    ap2.legend(loc='best', fontsize=22)
+    ap2.set_xlabel('U (V-SHE)', fontweight='bold', fontsize=32)
+    ap2.set_ylabel('Free Energy Change (eV)', fontweight='bold', fontsize=32)
+    ap2.set_title(r'Effects of EDL Models on $\Delta$G vs Applied Potential', fontweight='bold', fontsize=36)
+
+    gmax, gmin = max(np.concatenate(g_data)), min(np.concatenate(g_data))
+    ap2.axis([u[0] - 0.5, u[-1] + 0.5, gmin - 0.5, gmax + 0.5])
+    ap2.tick_params(axis='both', labelsize=32, width=4, colors='black', direction="in", grid_color='black', which='major', length=9, pad=20)
+
+    x = 0.75 + u[-1]
+    lines = [(r"$\Delta\mu$ = " + str(round(diff_dm, 2)) + " eÅ", 'k'),
+             (r"$\Delta$$\alpha$ = " + str(round(diff_polar, 2)) + " eÅ$^2$V$^{-1}$", 'k'),
+             (r"$\epsilon_r$ = " + str(er), 'k'),
+             ("d$_{EDL}$ = " + str(d) + r" $\AA$", 'k'),
+             ("U$_{pzc}$ = " + str(round(u_pzc, 2)) + " V-SHE", 'k')]
+    lines += [(r"$\Delta$G$_{%s}$=%.2fU+%.2f" % (key.upper(), TL[key][0], TL[key][1]), color)
+              for key, color, _ in models[:3]]
+    lines.append((r"$\Delta$G$_{2C}$=%.2fU$^2$+%.2fU+%.2f" % tuple(TL['2c'][:3]), 'g'))
+    for i, (text, color) in enumerate(lines):
+        ap2.text(x, gmax - 0.3 * i, text, c=color, fontsize=28)
+    return fig
+
+
+def compartment_profiles(u_prime, terms, er, d):
+    """
+    Capacitive, dipole-field and polarizability contributions vs U-U_pzc in
+    three stacked panels (second figure of Barrier_EDL_Base.py).
+
+    terms holds 1D arrays along u_prime under 'c_total', 'dm_total' and
+    'p_total', e.g. edl_terms() output for one reaction, er and d.
+    """
+    plt = _pyplot()
+
+    total_edl = terms['c_total'] + terms['dm_total'] + terms['p_total']
+    fig, axs = plt.subplots(3, 1, figsize=(8, 12), sharex=True)
+    for ax, (key, label, color) in zip(axs, (('c_total', 'Capacitive', 'red'), ('dm_total', 'Dipole-Field', 'blue'),
+                                             ('p_total', 'Polarizability', 'green'))):
+        ax.bar(u_prime, terms[key], 0.05, label=label, color=color, zorder=0)
+        ax.axhline(y=0, color='black', linestyle='-', alpha=1, linewidth=5)
+        ax.set_facecolor('white')
+        ax.patch.set_edgecolor('black')
+        ax.patch.set_linewidth(4)
+        ax.set_ylabel(r"$\Delta$G$_{EDL}$ (eV)", fontweight='bold', fontsize=24)
+        ax.tick_params(axis='both', labelsize=24, width=4, colors='black', direction="in", grid_color='black', which='major', length=9, pad=20)
+        ax.tick_params(axis='both', which='minor', length=5, width=4, direction='in')
+        ax.legend(loc='best', fontsize=24)
+        ax.set_xlim([u_prime[0] - 0.5, u_prime[-1] + 0.5])
+        ax.grid(False)
+        if max(total_edl) <= 0:
+            ax.set_ylim(min(total_edl) - 0.5, max(total_edl))
+        else:
+            ax.set_ylim(min(total_edl) - 0.6, max(total_edl) + 0.5)
+    axs[2].set_xlabel("U-U$_{pzc}$ (V-NHE)", fontweight='bold', fontsize=32)
+    fig.suptitle("Decompartmentalizing EDL Effects at $\\epsilon_r$ = {:.2f} and d = {:.2f} Å".format(er, d),
+                 fontweight='bold', fontsize=18)
+    fig.tight_layout()
+    return fig
+
+
+def total_edl_bars(u_prime, terms):
+    """Sum of the EDL contributions vs U-U_pzc (third figure of Barrier_EDL_Base.py); terms as in compartment_profiles()."""
+    plt = _pyplot()
+
+    total_edl = terms['c_total'] + terms['dm_total'] + terms['p_total']
+    fig = plt.figure(figsize=(12, 10))
+    ap2 = fig.add_subplot(111)
+    ap2.bar(u_prime, total_edl, 0.07, color='blue')
+    ap2.axhline(y=0, color='black', linestyle='-', alpha=0.9, linewidth=5)
+    ap2.set_facecolor('white')
+    ap2.patch.set_edgecolor('black')
+    ap2.patch.set_linewidth(5)
+    ap2.grid(False)
+    ap2.set_xlabel("U-U$_{pzc}$ (V-NHE)", fontweight='bold', fontsize=32)
+    ap2.set_ylabel("Free Energy Change(eV)", fontweight='bold', fontsize=32)
+    ap2.set_title("Total Contribution of EDL Effects", fontweight='bold', fontsize=32)
+    ap2.tick_params(axis='both', labelsize=32, width=4, colors='black', direction="in", grid_color='black', which='major', length=9, pad=20)
+    ap2.tick_params(axis='both', which='minor', length=5, width=4, direction='in')
+    ap2.set_xlim([u_prime[0] - 0.5, u_prime[-1] + 0.5])
+    if max(total_edl) <= 0:
+        ap2.set_ylim(min(total_edl) - 0.5, 0.5)
+    else:
+        ap2.set_ylim(min(total_edl) - 0.5, max(total_edl) + 0.5)
+    return fig
+
+
+# %% Rendering
+
+def _render(name, func, kwargs, out_dir, fmt, dpi):
+    """Draw one figure, save it and free it (runs in a worker process)."""
+    plt = _pyplot()
+    with stage('plot:' + name, 'plot'):
+        fig = func(**kwargs)
+    path = os.path.join(out_dir, '%s.%s' % (name, fmt))
+    with stage('savefig', 'plot'):
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+@profiled('plot')
+def render_figures(jobs, target='show', workers=None, fmt='png', dpi=150):
+    """
+    Render queued figures.
+
+    Parameters
+    ----------
+    jobs : sequence of (name, function, kwargs)
+        Figure functions of this module (or any picklable function returning
+        a Figure) with their keyword arguments.
+    target : None, 'show' or str
+        None skips plotting, 'show' draws in-process and calls plt.show(),
+        anything else is a folder the figures are saved into as <name>.<fmt>.
+    workers : int, optional
+        Processes used when saving; 1 renders in-process.
+
+    Returns
+    -------
+    list of str
+        Paths of the saved figures (empty unless saving).
+    """
+    jobs = list(jobs)
+    if target is None or not jobs:
+        return []
+    if target == 'show':
+        import matplotlib.pyplot as plt
+        for name, func, kwargs in jobs:
+            with stage('plot:' + name, 'plot'):
+                func(**kwargs)
+        with stage('plt.show', 'plot'):
+            plt.show()
+        return []
+
+    os.makedirs(target, exist_ok=True)
+    if workers == 1 or len(jobs) == 1:
+        return [_render(name, func, kwargs, target, fmt, dpi) for name, func, kwargs in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(jobs))) as pool:
+        futures = [pool.submit(_render, name, func, kwargs, target, fmt, dpi) for name, func, kwargs in jobs]
+        return [f.result() for f in futures]
+
+
+def save_figures(result, out_dir, fmt='png', workers=None):
+    """Save one G_2C figure per reaction of an EDLResult into out_dir and return the paths."""
+    jobs = [('%s_g_2c' % m, plot_g_2c, {'result': result, 'reaction': m}) for m in result.coords['reaction']]
+    return render_figures(jobs, out_dir, workers=workers, fmt=fmt)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Batch polarizability fitting from EFIELD single points (bash scripts/polar)
+
+bash scripts/polar creates a field/ folder next to each optimized state with
+single points at EFIELD = 0.1 ... 0.6. The energy of a state in a field F
+(V/A, numerically equal to EFIELD in eV/A) is
+
+    E(F) = E_0 - mu_0*F - 0.5*alpha*F^2
+
+so a quadratic fit of E(F) gives the polarizability alpha (eA^2V^-1) and the
+zero-field dipole mu_0 (eA). The field-dependent dipole is mu(F) = mu_0 + alpha*F.
+
+fit_polarizability() fits every state at once: states sharing the same set of
+converged fields are solved with a single least-squares call. fit_states()
+reads whole field/ trees and returns rows keyed by state name, whose 'alpha'
+feeds Polar_In/Polar_Fin/Polar_Bare in agcdft.outcar.state_rows().
+"""
+
+import os
+
+import numpy as np
+
+from .outcar import extract_states
+
+
+def fit_polarizability(fields, energies, dipoles=None):
+    """
+    Quadratic fit of E(F) for many states.
+
+    Parameters
+    ----------
+    fields : array_like, shape (F,) or (S, F)
+        Applied fields (V/A), shared by all states or one row per state.
+    energies : array_like, shape (S, F)
+        Energies (eV). NaN marks a missing or unconverged single point.
+    dipoles : array_like, shape (S, F), optional
+        Dipole moments (eA) at each field, used for the alpha_dipole check.
+
+    Returns
+    -------
+    dict of arrays, shape (S,)
+        'alpha' (eA^2V^-1), 'mu_0' (eA), 'e_0' (eV), plus fit diagnostics:
+        'alpha_se' (standard error of alpha), 'rmse' (eV), 'r2',
+        'n_points' and 'alpha_dipole', the slope of the computed dipole
+        against the field (NaN without dipoles).
+    """
+    energies = np.atleast_2d(np.asarray(energies, dtype=float))
+    fields = np.broadcast_to(np.asarray(fields, dtype=float), energies.shape)
+    dipoles = None if dipoles is None else np.broadcast_to(np.asarray(dipoles, dtype=float), energies.shape)
+    n_states = energies.shape[0]
+    keys = ('alpha', 'mu_0', 'e_0', 'alpha_se', 'rmse', 'r2', 'n_points', 'alpha_dipole')
+    out = {k: np.full(n_states, np.nan) for k in keys}
+    valid = np.isfinite(energies) & np.isfinite(fields)
+    out['n_points'] = valid.sum(axis=1).astype(float)
+
+    # States with the same converged fields share one design matrix
+    groups = {}
+    for s in range(n_states):
+        groups.setdefault(tuple(fields[s, valid[s]]), []).append(s)
+
+    for field_set, states in groups.items():
+        if len(field_set) < 3:
+            continue
+        F = np.array(field_set)
+        X = np.stack([np.ones_like(F), F, F ** 2], axis=1)
+        Y = np.stack([energies[s, valid[s]] for s in states], axis=1) # (n_fields, n_group)
+        coef, _, _, _ = np.linalg.lstsq(X, Y, rcond=None)
+        resid = Y - X @ coef
+        ssr = (resid ** 2).sum(axis=0)
+        sst = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+        dof = len(F) - 3
+        idx = np.array(states)
+        out['e_0'][idx] = coef[0]
+        out['mu_0'][idx] = -coef[1]
+        out['alpha'][idx] = -2 * coef[2]
+        out['rmse'][idx] = np.sqrt(ssr / len(F))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['r2'][idx] = np.where(sst > 0, 1 - ssr / sst, np.nan)
+            if dof > 0:
+                out['alpha_se'][idx] = 2 * np.sqrt(ssr / dof * np.linalg.pinv(X.T @ X)[2, 2])
+
+        if dipoles is not None:
+            D = np.stack([dipoles[s, valid[s]] for s in states], axis=1)
+            ok = np.isfinite(D).all(axis=0)
+            if ok.any():
+                slope = np.polyfit(F, D[:, ok], 1)[0]
+                out['alpha_dipole'][idx[ok]] = slope
+    return out
+
+
+def field_folders(state_dir, field_dir='field'):
+    """(field, folder) pairs of the EFIELD single points below state_dir."""
+    root = os.path.join(state_dir, field_dir)
+    pairs = []
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            try:
+                pairs.append((float(name), os.path.join(root, name)))
+            except ValueError:
+                continue
+    return sorted(pairs)
+
+
+def fit_states(state_dirs, field_dir='field', zero_field=True, idipol=3, workers=None):
+    """
+    Read the field/ tree of every state and fit all of them in one batch.
+
+    Parameters
+    ----------
+    state_dirs : sequence of str
+        Folders of the optimized states, each holding field/<EFIELD>/OUTCAR.
+    zero_field : bool
+        Use the OUTCAR of the state folder itself as the F = 0 point.
+
+    Returns
+    -------
+    dict
+        State name -> dict with the fields of fit_polarizability() plus
+        'fields', 'energies' and 'dipoles' used in the fit.
+    """
+    state_dirs = list(state_dirs)
+    series = []
+    for state in state_dirs:
+        pairs = field_folders(state, field_dir)
+        if zero_field and os.path.isfile(os.path.join(state, 'OUTCAR')):
+            pairs = [(0.0, state)] + pairs
+        series.append(pairs)
+
+    folders = sorted({folder for pairs in series for _, folder in pairs})
+    read = {row['folder']: row for row in extract_states(folders, idipol, locpot=False, workers=workers).values()}
+
+    n_fields = max((len(pairs) for pairs in series), default=0)
+    fields = np.full((len(state_dirs), n_fields), np.nan)
+    energies = np.full_like(fields, np.nan)
+    dipoles = np.full_like(fields, np.nan)
+    for s, pairs in enumerate(series):
+        for f, (field, folder) in enumerate(pairs):
+            fields[s, f] = field
+            energies[s, f] = read[folder]['energy']
+            dipoles[s, f] = read[folder]['dipole']
+
+    fit = fit_polarizability(fields, energies, dipoles)
+    rows = {}
+    for s, state in enumerate(state_dirs):
+        row = {k: v[s] for k, v in fit.items()}
+        row.update(fields=fields[s], energies=energies[s], dipoles=dipoles[s])
+        rows[os.path.basename(os.path.normpath(state))] = row
+    return rows
+
+
+def dipole_at_field(fit, field):
+    """Field-dependent dipole mu(F) = mu_0 + alpha*F for fitted states, shape (S, F)."""
+    return np.asarray(fit['mu_0'])[:, None] + np.asarray(fit['alpha'])[:, None] * np.atleast_1d(field)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Stage-level profiling of the aGC-DFT pipeline
+
+Pipeline functions are wrapped with profiled(category) and inner hot spots
+with `with stage(name, category):`. While profiling is off both cost one flag
+check. Switched on (enable(), $AGCDFT_PROFILE or `python -m agcdft sweep
+--profile trace.json`) every call records its wall time, its peak traced
+allocation (tracemalloc, nested stages included) and its parent, and
+summary() aggregates call counts, inclusive and self time per stage.
+
+write_trace() emits Chrome trace-event JSON (load it in chrome://tracing or
+https://ui.perfetto.dev) with the summary under an extra 'summary' key.
+$AGCDFT_PROFILE=path.json writes it when the process exits (any other
+non-empty value writes agcdft_profile.json in the working directory).
+
+Categories: load, derive, kernel, post (beta, onsets, kinetics, statistics),
+plot and export. Only the calling process is recorded; work done in worker
+processes shows up as the time the parent stage waits for it.
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+_state = {'enabled': False, 'memory': False, 't0': time.perf_counter_ns()}
+_events = []
+_local = threading.local()
+
+
+def enabled():
+    return _state['enabled']
+
+
+def enable(memory=True):
+    """Start recording; memory=True also traces allocations (slower)."""
+    _state['enabled'] = True
+    _state['memory'] = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _state['enabled'] = False
+    if _state['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def reset():
+    """Drop the recorded events."""
+    del _events[:]
+
+
+class stage:
+    """Context manager timing one pipeline stage, e.g. `with stage('heatmap_format', 'plot'):`."""
+
+    __slots__ = ('name', 'category', '_start', '_frame')
+
+    def __init__(self, name, category='post'):
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        if not _state['enabled']:
+            self._start = None
+            return self
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        memory = _state['memory'] and tracemalloc.is_tracing()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak) #Outer peak so far survives the reset
+            tracemalloc.reset_peak()
+        self._frame = {'peak': 0, 'base': current if memory else 0, 'children': 0}
+        stack.append(self._frame)
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is None:
+            return False
+        end = time.perf_counter_ns()
+        stack = _local.stack
+        frame = stack.pop()
+        peak = None
+        if _state['memory'] and tracemalloc.is_tracing():
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            peak = max(peak - frame['base'], 0)
+        duration = end - self._start
+        if stack:
+            stack[-1]['children'] += duration
+        _events.append({'name': self.name, 'cat': self.category, 'ts': (self._start - _state['t0']) / 1e3,
+                        'dur': duration / 1e3, 'self': (duration - frame['children']) / 1e3,
+                        'peak_mb': None if peak is None else peak / 2 ** 20,
+                        'depth': len(stack), 'tid': threading.get_ident()})
+        return False
+
+
+def profiled(category, name=None):
+    """Decorator recording every call of a function as a stage (default name: the function name)."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            with stage(label, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def summary():
+    """Per stage: category, calls, total (inclusive) and self seconds, max peak MB; slowest first."""
+    out = {}
+    for e in _events:
+        s = out.setdefault(e['name'], {'category': e['cat'], 'calls': 0, 'total_s': 0.0, 'self_s': 0.0,
+                                       'peak_mb': None})
+        s['calls'] += 1
+        s['total_s'] += e['dur'] / 1e6
+        s['self_s'] += e['self'] / 1e6
+        if e['peak_mb'] is not None:
+            s['peak_mb'] = max(s['peak_mb'] or 0.0, e['peak_mb'])
+    by_category = {}
+    for e in _events:
+        by_category[e['cat']] = by_category.get(e['cat'], 0.0) + e['self'] / 1e6
+    return {'stages': dict(sorted(out.items(), key=lambda kv: -kv[1]['total_s'])),
+            'categories_self_s': dict(sorted(by_category.items(), key=lambda kv: -kv[1]))}
+
+
+def report(file=None):
+    """Print summary() as a table."""
+    file = file or sys.stdout
+    s = summary()
+    print('%-28s %-8s %7s %11s %11s %10s' % ('stage', 'category', 'calls', 'total (s)', 'self (s)', 'peak (MB)'), file=file)
+    for name, v in s['stages'].items():
+        peak = '%10.1f' % v['peak_mb'] if v['peak_mb'] is not None else '%10s' % '-'
+        print('%-28s %-8s %7d %11.4f %11.4f %s' % (name[:28], v['category'], v['calls'], v['total_s'], v['self_s'], peak),
+              file=file)
+
+
+def write_trace(path):
+    """Chrome trace-event JSON of every recorded stage plus the summary; returns path."""
+    pid = os.getpid()
+    events = [{'name': e['name'], 'cat': e['cat'], 'ph': 'X', 'ts': e['ts'], 'dur': e['dur'], 'pid': pid,
+               'tid': e['tid'], 'args': {'self_us': e['self'], 'peak_mb': e['peak_mb']}} for e in _events]
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    with open(path, 'w') as fh:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'summary': summary()}, fh)
+    return path
+
+
+def _from_environment():
+    value = os.environ.get('AGCDFT_PROFILE', '')
+    if not value or value == '0':
+        return
+    path = value if value.lower().endswith('.json') else 'agcdft_profile.json'
+    enable(memory=os.environ.get('AGCDFT_PROFILE_MEMORY', '1') != '0')
+    atexit.register(lambda: _events and write_trace(path))
+
+
+_from_environment()
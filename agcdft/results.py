@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Labelled dense result tensor for aGC-DFT sweeps
+
+EDLResult holds one array with axes (reaction, er, d, u, term) plus the label
+of every position along each axis. Labels are looked up through dictionaries,
+so selecting a reaction, dielectric constant, EDL width, potential or term is
+an index operation rather than a scan over tuple-keyed dicts, and the
+potential grid is stored once instead of once per entry.
+
+Results can be saved to .npz without extra dependencies, or to NetCDF/Zarr
+through xarray when it is installed.
+"""
+
+import numpy as np
+
+from .profiling import profiled
+
+RESULT_AXES = ('reaction', 'er', 'd', 'u', 'term')
+
+
+class EDLResult:
+    """
+    Dense (reaction, er, d, u, term) array with labelled axes.
+
+    Parameters
+    ----------
+    values : ndarray, shape (R, E, D, U, T)
+    reaction, er, d, u, term : sequence
+        Labels along each axis: reaction names, dielectric constants, EDL
+        widths (A), potentials (V-SHE) and term names (e.g. 'g_2c').
+    attrs : dict, optional
+        Scalar metadata saved with the result (e.g. sheet name, e_vac).
+    """
+
+    def __init__(self, values, reaction, er, d, u, term, attrs=None):
+        self.values = values
+        self.coords = {
+            'reaction': np.asarray(reaction, dtype=str),
+            'er': np.asarray(er, dtype=float),
+            'd': np.asarray(d, dtype=float),
+            'u': np.asarray(u, dtype=float),
+            'term': np.asarray(term, dtype=str),
+        }
+        self.attrs = dict(attrs or {})
+        expected = tuple(self.coords[ax].size for ax in RESULT_AXES)
+        if values.shape != expected:
+            raise ValueError("values have shape %s but the labels imply %s" % (values.shape, expected))
+        self._index = {}
+        for ax in RESULT_AXES:
+            labels = self.coords[ax].tolist()
+            index = {label: i for i, label in enumerate(labels)}
+            if len(index) != len(labels):
+                raise ValueError("duplicate labels along the %s axis" % ax)
+            self._index[ax] = index
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def index(self, axis, label):
+        """Integer position of ``label`` along ``axis``."""
+        try:
+            return self._index[axis][label]
+        except KeyError:
+            raise KeyError("%r is not a label of the %s axis" % (label, axis)) from None
+
+    def sel(self, **labels):
+        """
+        Select by label, e.g. sel(reaction='C-H', er=78.4, d=3, term='g_2c').
+
+        A scalar label drops its axis, a list of labels keeps it. Returns a
+        NumPy array (a view when every label is a scalar).
+        """
+        return self.isel(**{ax: ([self.index(ax, lab) for lab in label]
+                                 if isinstance(label, (list, tuple, np.ndarray)) else self.index(ax, label))
+                            for ax, label in labels.items()})
+
+    def isel(self, **positions):
+        """Select by integer position along the named axes, as sel()."""
+        unknown = [ax for ax in positions if ax not in RESULT_AXES]
+        if unknown:
+            raise KeyError("unknown axes %s, expected %s" % (unknown, RESULT_AXES))
+        out = self.values[tuple(positions[ax] if np.isscalar(positions.get(ax, slice(None))) else slice(None)
+                                for ax in RESULT_AXES)]
+        # List selections are applied one axis at a time to keep outer-product semantics
+        kept = [ax for ax in RESULT_AXES if not np.isscalar(positions.get(ax, slice(None)))]
+        for axis, ax in enumerate(kept):
+            if ax in positions:
+                out = np.take(out, positions[ax], axis=axis)
+        return out
+
+    @profiled('export', 'EDLResult.to_npz')
+    def to_npz(self, path, compressed=False):
+        """Save values, labels and attrs to an .npz file."""
+        save = np.savez_compressed if compressed else np.savez
+        attrs = {'attr_' + k: np.asarray(v) for k, v in self.attrs.items()}
+        save(path, values=self.values, **{'coord_' + ax: self.coords[ax] for ax in RESULT_AXES}, **attrs)
+
+    @classmethod
+    def from_npz(cls, path):
+        """Load a result written by to_npz()."""
+        with np.load(path, allow_pickle=False) as npz:
+            attrs = {k[5:]: npz[k].item() for k in npz.files if k.startswith('attr_')}
+            return cls(npz['values'], *(npz['coord_' + ax] for ax in RESULT_AXES), attrs=attrs)
+
+    def to_xarray(self):
+        """Return the result as an xarray.DataArray (requires xarray)."""
+        try:
+            import xarray as xr
+        except ImportError:
+            raise ImportError("xarray is required for NetCDF/Zarr export: pip install xarray") from None
+        return xr.DataArray(self.values, dims=RESULT_AXES, coords=self.coords, attrs=self.attrs, name='edl')
+
+    @profiled('export', 'EDLResult.to_netcdf')
+    def to_netcdf(self, path):
+        """Save to NetCDF through xarray."""
+        self.to_xarray().to_netcdf(path)
+
+    @profiled('export', 'EDLResult.to_zarr')
+    def to_zarr(self, path):
+        """Save to a Zarr store through xarray."""
+        self.to_xarray().to_dataset().to_zarr(path, mode='w')
+
+    def __repr__(self):
+        return 'EDLResult(%s)' % ', '.join('%s: %d' % (ax, n) for ax, n in zip(RESULT_AXES, self.shape))
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Variance-based global sensitivity (Sobol indices) of G_2C and beta
+
+Parameters sampled: dielectric constant (er), EDL width (d), dipole moment
+change (diff_dm), polarizability change (diff_polar), surface area (area) and
+potential of zero charge (u_pzc). Every parameter given bounds is drawn
+uniformly within them; the others stay at the nominal value of each reaction.
+diff_dm and diff_polar are varied through the final state (dm_fin = dm_in +
+diff_dm, polar_fin = polar_in + diff_polar).
+
+Samples come from a scrambled Sobol sequence (scipy.stats.qmc) in the
+Saltelli scheme: base matrices A and B and, for every parameter i, A with
+column i taken from B (AB_i), i.e. N*(k + 2) model evaluations. Indices are
+
+    S_i  = mean(f(B)*(f(AB_i) - f(A))) / V          (first order, Saltelli 2010)
+    ST_i = mean((f(A) - f(AB_i))^2) / (2*V)         (total order, Jansen 1999)
+
+with V the variance of f over A and B. Model evaluations use the exact 2C
+polynomial of agcdft.kernel.edl_polynomials(paired=True), so a chunk of
+samples for all reactions is a single array expression.
+"""
+
+import numpy as np
+
+from .dataset import kernel_inputs
+from .kernel import E_VAC, edl_polynomials
+from .profiling import profiled
+
+SOBOL_PARAMETERS = ('er', 'd', 'diff_dm', 'diff_polar', 'area', 'u_pzc')
+
+
+def _evaluate(inputs, values, u, e_vac):
+    """G_2C and beta at potentials u for flattened parameter sets, shapes (M, U)."""
+    args = dict(inputs)
+    args['dm_fin'] = args['dm_in'] + values['diff_dm']
+    args['polar_fin'] = args['polar_in'] + values['diff_polar']
+    args['area'] = values['area']
+    args['u_pzc'] = values['u_pzc']
+    c = edl_polynomials(er=values['er'], d=values['d'], e_vac=e_vac, reference='she', paired=True,
+                        **args)['2c'][:, 0, 0, :, None]
+    return {'g_2c': (c[:, 0] * u + c[:, 1]) * u + c[:, 2], 'beta': 2 * c[:, 0] * u + c[:, 1]}
+
+
+@profiled('post')
+def sobol_indices(inputs, bounds, u, n_base=4096, chunk_size=1024, er=None, d=None, seed=None, e_vac=E_VAC):
+    """
+    First- and total-order Sobol indices of G_2C and beta for every reaction.
+
+    Parameters
+    ----------
+    inputs : dict
+        Per-reaction keyword arguments of agcdft.edl_terms() (e.g. from
+        agcdft.kernel_inputs()) giving the nominal values.
+    bounds : dict
+        Parameter (see SOBOL_PARAMETERS) -> (low, high), scalars or one
+        value per reaction. Only these parameters are varied.
+    u : array_like, shape (U,)
+        Potentials (V-SHE) at which G_2C and beta are analysed.
+    n_base : int
+        Base samples N (rounded up to a power of 2); the model is evaluated
+        N*(k + 2) times per reaction.
+    chunk_size : int
+        Base samples evaluated per batch (a power of 2).
+    er, d : float, optional
+        Fixed dielectric constant and EDL width (A) when they are not in bounds.
+
+    Returns
+    -------
+    dict
+        'parameters': the varied parameter names (length K), and for 'g_2c'
+        and 'beta' a dict with 'S1' and 'ST' of shape (R, K, U) and
+        'variance' of shape (R, U).
+    """
+    from scipy.stats import qmc
+
+    names = [p for p in SOBOL_PARAMETERS if p in bounds]
+    unknown = set(bounds) - set(SOBOL_PARAMETERS)
+    if unknown:
+        raise ValueError("cannot vary %s; choose from %s" % (sorted(unknown), SOBOL_PARAMETERS))
+    if not names:
+        raise ValueError("bounds must name at least one parameter")
+    fixed = {'er': er, 'd': d}
+    missing = [p for p in ('er', 'd') if p not in bounds and fixed[p] is None]
+    if missing:
+        raise ValueError("give bounds or a fixed value for %s" % ', '.join(missing))
+
+    n = np.broadcast(*(np.atleast_1d(v) for v in inputs.values())).size
+    nominal = {k: np.broadcast_to(np.asarray(v), (n,)) for k, v in inputs.items()}
+    nominal['diff_dm'] = nominal['dm_fin'] - nominal['dm_in']
+    nominal['diff_polar'] = nominal['polar_fin'] - nominal['polar_in']
+    nominal['er'] = np.full(n, np.nan if er is None else float(er))
+    nominal['d'] = np.full(n, np.nan if d is None else float(d))
+    low = {p: np.broadcast_to(np.asarray(bounds[p][0], dtype=float), (n,)) for p in names}
+    span = {p: np.broadcast_to(np.asarray(bounds[p][1], dtype=float), (n,)) - low[p] for p in names}
+
+    u = np.atleast_1d(np.asarray(u, dtype=float))
+    k = len(names)
+    m = int(np.ceil(np.log2(max(n_base, 2))))
+    chunk = 2 ** int(np.clip(np.floor(np.log2(max(chunk_size, 1))), 0, m))
+    engine = qmc.Sobol(d=2 * k, scramble=True, seed=seed)
+
+    shape = (n, u.size)
+    acc = {out: {'sum': np.zeros(shape), 'sumsq': np.zeros(shape), 'first': np.zeros((n, k, u.size)),
+                 'total': np.zeros((n, k, u.size))} for out in ('g_2c', 'beta')}
+    per_reaction = {key: np.asarray(v)[:, None, None] for key, v in nominal.items()
+                    if key in inputs and key not in ('dm_fin', 'polar_fin', 'area', 'u_pzc')}
+
+    for _ in range(2 ** m // chunk):
+        x = engine.random(chunk)
+        a, b = x[:, :k], x[:, k:]
+        # Unit-cube designs: A, B and AB_i, shape (k + 2, chunk, k)
+        design = np.repeat(a[None], k + 2, axis=0)
+        design[1] = b
+        for i in range(k):
+            design[i + 2][:, i] = b[:, i]
+
+        # Parameter values per reaction, shape (R, k + 2, chunk)
+        values = {p: np.broadcast_to(nominal[p][:, None, None], (n, k + 2, chunk)) for p in SOBOL_PARAMETERS}
+        for i, p in enumerate(names):
+            values[p] = low[p][:, None, None] + span[p][:, None, None] * design[None, :, :, i]
+        rows = {key: np.broadcast_to(v, (n, k + 2, chunk)).ravel() for key, v in per_reaction.items()}
+        res = _evaluate(rows, {p: np.ravel(v) for p, v in values.items()}, u, e_vac)
+
+        for out, f in res.items():
+            f = f.reshape(n, k + 2, chunk, u.size)
+            if 'shift' not in acc[out]:
+                acc[out]['shift'] = f[:, 0].mean(axis=1, keepdims=True) #Centre the sums against cancellation
+            f = f - acc[out]['shift'][:, None]
+            f_a, f_b, f_ab = f[:, 0], f[:, 1], f[:, 2:]
+            acc[out]['sum'] += f_a.sum(axis=1) + f_b.sum(axis=1)
+            acc[out]['sumsq'] += (f_a ** 2).sum(axis=1) + (f_b ** 2).sum(axis=1)
+            acc[out]['first'] += (f_b[:, None] * (f_ab - f_a[:, None])).sum(axis=2)
+            acc[out]['total'] += ((f_a[:, None] - f_ab) ** 2).sum(axis=2)
+
+    n_total = 2 ** m
+    result = {'parameters': names, 'n_base': n_total}
+    for out, s in acc.items():
+        mean = s['sum'] / (2 * n_total)
+        var = s['sumsq'] / (2 * n_total) - mean ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            v = np.where(var > 0, var, np.nan)[:, None]
+            result[out] = {'S1': s['first'] / n_total / v, 'ST': s['total'] / (2 * n_total) / v, 'variance': var}
+    return result
+
+
+def sobol_dataset(data, bounds, u, **kwargs):
+    """sobol_indices() for every reaction of a dataset from agcdft.load_reactions()."""
+    return sobol_indices(kernel_inputs(data), bounds, u, **kwargs)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Out-of-core sweeps: blocks streamed through the kernel into a memory-mapped .npy
+
+A screening tensor (reaction, er, d, U, term) quickly outgrows RAM, e.g.
+10^4 reactions x 50 er x 50 d x 500 U x 5 terms is 500 GB in float64.
+stream_sweep() never holds more than one block of it: the grid is cut into
+blocks of whole reactions (and, when a single reaction is too large, of er
+values) of at most chunk_points grid points, every block is evaluated with
+the same kernel as run_sweep() into a block buffer each process reuses, and
+written straight into values.npy, opened with np.lib.format.open_memmap.
+
+While a block is in memory the reductions are taken from it:
+
+    min, max   minimum and maximum of every term over U,  (R, E, D, T)
+    u_min      potential (V-SHE) of that minimum,         (R, E, D, T)
+    beta_avg   beta averaged over the U window,           (R, E, D)
+    onset      potential where G_2C reaches level,        (R, E, D)
+
+They are written into <name>.npy memory maps next to values.npy, so memory
+stays bounded by the block size whatever the grid. keep_values=False skips
+values.npy and keeps the reductions only. coords.json labels the axes and is
+written last, so a folder without it is an interrupted sweep.
+"""
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .beta import beta_average, beta_coefficients
+from .cache import ROW_INPUTS
+from .dataset import kernel_inputs
+from .edl_models import Helmholtz
+from .kernel import E_VAC, reaction_deltas
+from .onset import onset_potentials
+from .profiling import profiled
+from .results import EDLResult
+from .sweep import _WORKSPACE, TERMS, _n_reactions, _sweep_chunk
+
+REDUCTIONS = ('min', 'u_min', 'max', 'beta_avg', 'onset')
+PER_TERM = ('min', 'u_min', 'max') #Reductions with a trailing term axis
+DEFAULT_CHUNK_POINTS = 1 << 20 #Grid points per block
+
+
+def stream_blocks(n, n_er, n_d, n_u, chunk_points=DEFAULT_CHUNK_POINTS):
+    """(row slice, er slice) blocks of at most chunk_points grid points (at least one (d, U) plane)."""
+    plane = n_d * n_u
+    if n_er * plane <= chunk_points:
+        rows = max(1, chunk_points // (n_er * plane))
+        return [(slice(i, min(i + rows, n)), slice(0, n_er)) for i in range(0, n, rows)]
+    ers = max(1, chunk_points // plane)
+    return [(slice(i, i + 1), slice(j, min(j + ers, n_er))) for i in range(n) for j in range(0, n_er, ers)]
+
+
+def _stream_block(values_file, rows, er_block, blk, inputs, er, d, u, terms, reductions, u_window, level, e_vac,
+                  dtype, jit, edl_model):
+    """Evaluate one block, write it into values_file (if any) and return its reductions."""
+    shape = (_n_reactions(inputs), er.size, d.size, u.size, len(terms))
+    block = _sweep_chunk(inputs, er, d, u, terms, e_vac, out=_WORKSPACE.get('block', shape, dtype), jit=jit,
+                         edl_model=edl_model)
+    if values_file is not None:
+        out = np.load(values_file, mmap_mode='r+')
+        out[rows, er_block] = block
+        out.flush()
+        del out
+    red = {}
+    if 'min' in reductions or 'u_min' in reductions:
+        red['min'] = block.min(axis=3)
+        red['u_min'] = u[block.argmin(axis=3)]
+    if 'max' in reductions:
+        red['max'] = block.max(axis=3)
+    if 'beta_avg' in reductions:
+        deltas = reaction_deltas(inputs['dm_in'], inputs['dm_fin'], inputs['polar_in'], inputs['polar_fin'])
+        coeffs = beta_coefficients(deltas['diff_dm'], deltas['diff_polar'], deltas['diff_a_dm'], er, d,
+                                   inputs['area'], faradaic=inputs.get('faradaic', True), e_vac=e_vac)
+        red['beta_avg'] = beta_average(coeffs, u_window[0], u_window[1], inputs['u_pzc'])
+    if 'onset' in reductions:
+        red['onset'] = onset_potentials(er=er, d=d, level=level, e_vac=e_vac, **inputs)['u']
+    return blk, {k: v for k, v in red.items() if k in reductions}
+
+
+@profiled('kernel')
+def stream_sweep(inputs, er, d, u, folder=None, terms=('g_2c',), reductions=None, keep_values=True,
+                 chunk_points=DEFAULT_CHUNK_POINTS, workers=None, u_window=None, level=0.0, e_vac=E_VAC,
+                 dtype=np.float64, jit=False, edl_model=None):
+    """
+    Evaluate the aGC-DFT models over a (reaction, er, d, U) grid block by block.
+
+    Parameters
+    ----------
+    inputs : dict
+        Per-reaction keyword arguments of edl_terms().
+    er, d, u : array_like
+        Dielectric constants, EDL widths (A) and potentials (V-SHE).
+    folder : str, optional
+        Where values.npy, the reductions and coords.json are written.
+        Required with keep_values; without a folder the reductions are
+        returned as in-memory arrays.
+    terms : sequence of str
+        Entries of agcdft.sweep.TERMS stored along the last axis.
+    reductions : sequence of str, optional
+        Entries of REDUCTIONS computed while the blocks pass through.
+        Defaults to all of them, or to min, u_min and max for EDL models
+        other than Helmholtz, which have no closed-form beta or onset.
+    keep_values : bool
+        Write the full tensor to values.npy.
+    chunk_points : int
+        Grid points per block. Each worker holds one block of len(terms)
+        values per point plus one scratch term (agcdft.kernel.Workspace)
+        and the reductions of the block.
+    workers : int, optional
+        Worker processes; blocks are written by the workers themselves and
+        at most two per worker are in flight. Defaults to 1.
+    u_window : (float, float), optional
+        Window (V-SHE) of beta_avg. Defaults to the span of u.
+    level : float
+        G_2C level (eV) of the onset potential.
+    dtype : numpy dtype
+        Precision of values.npy and the reductions; np.float32 halves the
+        disk and memory use (error bound as in run_sweep()).
+    jit : bool
+        Evaluate the blocks with the numba loop of edl_terms_into().
+    edl_model : agcdft.edl_models.EDLModel, optional
+        Double-layer model; defaults to the Helmholtz capacitor.
+
+    Returns
+    -------
+    dict
+        'values' (read-only memory map of shape (R, E, D, U, T), or None)
+        and one array per reduction.
+    """
+    polynomial = edl_model is None or edl_model.polynomial
+    if reductions is None:
+        reductions = REDUCTIONS if polynomial else PER_TERM
+    terms, reductions = tuple(terms), tuple(reductions)
+    if not polynomial and set(reductions) & {'beta_avg', 'onset'}:
+        raise ValueError("beta_avg and onset are closed forms of the Helmholtz model, not of %r" % (edl_model,))
+    unknown = [t for t in terms if t not in TERMS] + [r for r in reductions if r not in REDUCTIONS]
+    if unknown:
+        raise ValueError("unknown terms or reductions %s, expected subsets of %s and %s" % (unknown, TERMS, REDUCTIONS))
+    if keep_values and folder is None:
+        raise ValueError("keep_values needs a folder to write values.npy into")
+    er, d, u = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (er, d, u))
+    dtype = np.dtype(dtype)
+    u_window = (float(u.min()), float(u.max())) if u_window is None else tuple(u_window)
+    n = _n_reactions(inputs)
+    shape = (n, er.size, d.size, u.size, len(terms))
+    rows_inputs = {k: np.broadcast_to(np.asarray(v), (n,)) for k, v in inputs.items() if k in ROW_INPUTS}
+
+    values_file = None
+    out = {}
+    if folder is not None:
+        os.makedirs(folder, exist_ok=True)
+        stale = ['coords.json'] + [name + '.npy' for name in REDUCTIONS if name not in reductions]
+        for name in stale + ([] if keep_values else ['values.npy']):
+            if os.path.exists(os.path.join(folder, name)):
+                os.remove(os.path.join(folder, name)) #Leftovers of an earlier sweep; no coords.json marks it incomplete
+        if keep_values:
+            values_file = os.path.join(folder, 'values.npy')
+            np.lib.format.open_memmap(values_file, mode='w+', dtype=dtype, shape=shape).flush() #Sized only, blocks fill it
+    for name in reductions:
+        red_shape = shape[:3] + ((len(terms),) if name in PER_TERM else ())
+        if folder is None:
+            out[name] = np.empty(red_shape, dtype=dtype)
+        else:
+            out[name] = np.lib.format.open_memmap(os.path.join(folder, name + '.npy'), mode='w+', dtype=dtype,
+                                                  shape=red_shape)
+
+    blocks = stream_blocks(n, er.size, d.size, u.size, chunk_points)
+    args = [(values_file, rows, ers, blk, {k: v[rows] for k, v in rows_inputs.items()}, er[ers], d, u, terms,
+             reductions, u_window, level, e_vac, dtype, jit, edl_model) for blk, (rows, ers) in enumerate(blocks)]
+
+    def collect(blk, red):
+        rows, ers = blocks[blk]
+        for name, val in red.items():
+            out[name][rows, ers] = val
+
+    workers = workers or 1
+    if workers == 1 or len(blocks) == 1:
+        for a in args:
+            collect(*_stream_block(*a))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(blocks))) as pool:
+            pending = set()
+            for a in args:
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(*future.result())
+                pending.add(pool.submit(_stream_block, *a))
+            for future in pending:
+                collect(*future.result())
+
+    if folder is not None:
+        for name in reductions:
+            out[name].flush()
+        out = {name: np.load(os.path.join(folder, name + '.npy'), mmap_mode='r') for name in reductions}
+    out['values'] = np.load(values_file, mmap_mode='r') if values_file else None
+    return out
+
+
+def _write_coords(folder, reaction, er, d, u, terms, attrs):
+    with open(os.path.join(folder, 'coords.json.tmp'), 'w') as fh:
+        json.dump({'reaction': [str(m) for m in reaction], 'er': er.tolist(), 'd': d.tolist(), 'u': u.tolist(),
+                   'term': list(terms), 'attrs': attrs}, fh)
+    os.replace(os.path.join(folder, 'coords.json.tmp'), os.path.join(folder, 'coords.json'))
+
+
+def stream_dataset(data, er, d, u, folder=None, terms=('g_2c',), **kwargs):
+    """
+    stream_sweep() on a dataset from agcdft.load_reactions().
+
+    With a folder, coords.json labelling the axes is written once the sweep
+    is complete and the folder can be reopened with open_stream(). Returns
+    (EDLResult over the memory-mapped values or None, dict of reductions).
+    """
+    er, d, u = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (er, d, u))
+    out = stream_sweep(kernel_inputs(data), er, d, u, folder, terms=terms, **kwargs)
+    values = out.pop('values')
+    u_low, u_high = kwargs.get('u_window') or (u.min(), u.max())
+    attrs = {'e_vac': kwargs.get('e_vac', E_VAC), 'edl_model': (kwargs.get('edl_model') or Helmholtz()).key(),
+             'level': kwargs.get('level', 0.0),
+             'u_low': float(u_low), 'u_high': float(u_high)}
+    if folder is not None:
+        _write_coords(folder, data['M'], er, d, u, terms, attrs)
+    result = None if values is None else EDLResult(values, data['M'], er, d, u, terms, attrs=attrs)
+    return result, out
+
+
+def open_stream(folder):
+    """Reopen a completed stream_dataset() folder as (EDLResult or None, dict of reductions), memory-mapped."""
+    coords_file = os.path.join(folder, 'coords.json')
+    if not os.path.exists(coords_file):
+        raise FileNotFoundError("%s has no coords.json; the sweep did not finish" % folder)
+    with open(coords_file) as fh:
+        coords = json.load(fh)
+    reductions = {name: np.load(os.path.join(folder, name + '.npy'), mmap_mode='r') for name in REDUCTIONS
+                  if os.path.exists(os.path.join(folder, name + '.npy'))}
+    values_file = os.path.join(folder, 'values.npy')
+    result = None
+    if os.path.exists(values_file):
+        result = EDLResult(np.load(values_file, mmap_mode='r'), coords['reaction'], coords['er'], coords['d'],
+                           coords['u'], coords['term'], attrs=coords['attrs'])
+    return result, reductions
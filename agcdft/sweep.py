@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel parameter sweeps over (reaction, er, d, U) grids
+
+run_sweep() splits the reaction axis into chunks, evaluates each chunk with
+the fused agcdft.kernel.edl_terms_into() on a process pool and writes the
+requested terms into one preallocated array of shape (reaction, er, d, U,
+term); in-process chunks are written straight into it and the scratch space
+of every process is allocated once and reused chunk after chunk. With a
+ResultCache (agcdft.cache) rows computed before are loaded instead and only
+the missing rows are evaluated. incremental_sweep() keeps one result tensor
+per store folder and, on the next run, evaluates only the reactions whose
+inputs changed and the er, d or U values that were added.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .cache import ROW_INPUTS as PER_REACTION
+from .cache import ResultCache, row_hashes
+from .dataset import kernel_inputs
+from .edl_models import Helmholtz
+from .kernel import E_VAC, MODEL_VERSION, Workspace, edl_terms_into
+from .profiling import profiled
+from .results import EDLResult
+
+_WORKSPACE = Workspace() #Scratch space of this process, reused by every chunk
+TERMS = ('g_1a', 'g_1b', 'g_2a', 'g_2b', 'g_2c', 'c_total', 'dm_total', 'p_total', 'EDL_total')
+STORE_KWARGS = ('workers', 'chunk_size', 'e_vac', 'dtype', 'jit', 'edl_model') #Keywords of incremental_sweep()
+
+
+def _n_reactions(inputs):
+    return np.broadcast(*(np.atleast_1d(inputs[k]) for k in PER_REACTION if k in inputs)).size
+
+
+def _slice_inputs(inputs, n, start, stop):
+    """Per-reaction kernel inputs for rows start:stop."""
+    return {k: np.broadcast_to(np.asarray(v), (n,))[start:stop] for k, v in inputs.items() if k in PER_REACTION}
+
+
+def _sweep_chunk(inputs, er, d, u, terms, e_vac, dtype=np.float64, out=None, jit=False, edl_model=None):
+    """Evaluate one chunk with the requested terms along the last axis, into out if given."""
+    if out is None:
+        out = np.empty((_n_reactions(inputs), np.size(er), np.size(d), np.size(u), len(terms)), dtype=dtype)
+    return edl_terms_into(out, terms, er=er, d=d, u=u, e_vac=e_vac, workspace=_WORKSPACE, jit=jit,
+                          edl_model=edl_model, **inputs)
+
+
+def reaction_chunks(n, chunk_size):
+    """(start, stop) pairs covering n reactions in blocks of chunk_size."""
+    return [(i, min(i + chunk_size, n)) for i in range(0, n, chunk_size)]
+
+
+@profiled('kernel')
+def run_sweep(inputs, er, d, u, terms=('g_2c',), workers=None, chunk_size=None, out=None, cache=None,
+              e_vac=E_VAC, dtype=np.float64, jit=False, edl_model=None):
+    """
+    Evaluate the aGC-DFT models over a (reaction, er, d, U) grid in parallel.
+
+    Parameters
+    ----------
+    inputs : dict
+        Per-reaction keyword arguments of edl_terms(), e.g. from
+        agcdft.dataset.kernel_inputs().
+    er, d, u : array_like
+        Dielectric constants, EDL widths (A) and potentials (V-SHE).
+    terms : sequence of str
+        Entries of TERMS to keep, stored in this order along the last axis.
+    workers : int, optional
+        Number of worker processes. Defaults to os.cpu_count(); 1 runs the
+        chunks in the calling process.
+    chunk_size : int, optional
+        Reactions per chunk. Defaults to about four chunks per worker.
+    out : ndarray, optional
+        Preallocated result of shape (R, E, D, U, len(terms)).
+    cache : ResultCache or bool, optional
+        Per-row result cache; True uses the default ResultCache().
+    dtype : numpy dtype
+        np.float32 evaluates the potential grid and stores the result in
+        single precision, halving memory and disk. The error against
+        float64 stays below agcdft.kernel.FLOAT32_ERROR times the sum of
+        the term magnitudes (under 1e-6 eV for the bundled datasets); only
+        the requested terms are kept either way.
+    jit : bool
+        Evaluate the chunks with the numba loop of edl_terms_into().
+    edl_model : agcdft.edl_models.EDLModel, optional
+        Double-layer model; defaults to the Helmholtz capacitor.
+
+    Returns
+    -------
+    ndarray, shape (R, E, D, U, len(terms))
+    """
+    terms = tuple(terms)
+    dtype = np.dtype(dtype)
+    unknown = [t for t in terms if t not in TERMS]
+    if unknown:
+        raise ValueError("unknown terms %s, expected a subset of %s" % (unknown, TERMS))
+    er = np.atleast_1d(np.asarray(er, dtype=float))
+    d = np.atleast_1d(np.asarray(d, dtype=float))
+    u = np.atleast_1d(np.asarray(u, dtype=float))
+    n = _n_reactions(inputs)
+    shape = (n, er.size, d.size, u.size, len(terms))
+
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape:
+        raise ValueError("out has shape %s, expected %s" % (out.shape, shape))
+
+    if cache:
+        cache = ResultCache() if cache is True else cache
+        keys = cache.row_keys(inputs, er, d, u, terms, e_vac, dtype, edl_model)
+        missing = []
+        for i, key in enumerate(keys):
+            row = cache.load(key)
+            if row is None or row.shape != shape[1:] or row.dtype != dtype:
+                missing.append(i)
+            else:
+                out[i] = row
+        if missing:
+            rows = {k: np.broadcast_to(np.asarray(v), (n,))[missing] for k, v in inputs.items() if k in PER_REACTION}
+            block = run_sweep(rows, er, d, u, terms, workers=workers, chunk_size=chunk_size, e_vac=e_vac, dtype=dtype,
+                              jit=jit, edl_model=edl_model)
+            out[missing] = block
+            for i, row in zip(missing, block):
+                cache.store(keys[i], row)
+            cache.trim()
+        return out
+
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, -(-n // (4 * workers)))
+    chunks = reaction_chunks(n, chunk_size)
+
+    if workers == 1 or len(chunks) == 1:
+        for start, stop in chunks:
+            if out.dtype == dtype:
+                _sweep_chunk(_slice_inputs(inputs, n, start, stop), er, d, u, terms, e_vac, out=out[start:stop], jit=jit,
+                             edl_model=edl_model)
+            else:
+                out[start:stop] = _sweep_chunk(_slice_inputs(inputs, n, start, stop), er, d, u, terms, e_vac, dtype,
+                                               jit=jit, edl_model=edl_model)
+        return out
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = {pool.submit(_sweep_chunk, _slice_inputs(inputs, n, start, stop), er, d, u, terms, e_vac, dtype,
+                               jit=jit, edl_model=edl_model):
+                   (start, stop) for start, stop in chunks}
+        for future in as_completed(futures):
+            start, stop = futures[future]
+            out[start:stop] = future.result()
+    return out
+
+
+def _match(new, old):
+    """Position in old of every entry of new (-1 where absent)."""
+    where = {v: i for i, v in enumerate(old)}
+    return np.array([where.get(v, -1) for v in new], dtype=int)
+
+
+@profiled('kernel')
+def incremental_sweep(inputs, er, d, u, store, terms=('g_2c',), workers=None, chunk_size=None, e_vac=E_VAC,
+                      dtype=np.float64, jit=False, edl_model=None):
+    """
+    run_sweep() that reuses the result stored in ``store`` by the previous call.
+
+    The store folder holds values.npy (R, E, D, U, T) and manifest.json with
+    the SHA-256 of every row's kernel inputs (agcdft.cache.row_hashes()) and
+    the er, d and U values. Rows are matched by hash and grid values by
+    value, so reordered, added or removed reactions and grid values all
+    reuse what was computed. A changed surface constant (area, U_pzc, bare
+    polarizability) changes the hash of every row on that surface. Only the
+    complement of the reused block is evaluated:
+
+        new rows x full grid, then for reused rows:
+        new er x all d, U;  reused er x new d x all U;  reused er, d x new U
+
+    A different terms, e_vac, dtype, EDL model or kernel version recomputes
+    everything. When
+    the layout is unchanged the stored values.npy is updated in place through
+    a memory map and returned memory-mapped, so an unchanged rerun costs
+    little more than hashing the rows.
+
+    Returns
+    -------
+    values : ndarray, shape (R, E, D, U, len(terms))
+    changes : dict
+        Indices of the recomputed 'rows' and of the new 'er', 'd' and 'u'
+        values, plus the 'fraction' of grid points evaluated.
+    """
+    terms = tuple(terms)
+    dtype = np.dtype(dtype)
+    model_key = (edl_model or Helmholtz()).key()
+    er, d, u = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (er, d, u))
+    hashes = row_hashes(inputs)
+    n = len(hashes)
+    shape = (n, er.size, d.size, u.size, len(terms))
+    manifest_file, values_file = os.path.join(store, 'manifest.json'), os.path.join(store, 'values.npy')
+
+    manifest = None
+    if os.path.exists(manifest_file) and os.path.exists(values_file):
+        with open(manifest_file) as fh:
+            manifest = json.load(fh)
+        if (manifest.get('model_version') != MODEL_VERSION or tuple(manifest['terms']) != terms
+                or manifest['e_vac'] != float(e_vac) or manifest.get('dtype', 'float64') != dtype.name
+                or manifest.get('edl_model', 'helmholtz') != model_key):
+            manifest = None
+    if manifest is None:
+        idx = [np.full(size, -1) for size in shape[:4]]
+    else:
+        idx = [_match(hashes, manifest['rows'])] + [_match(x.tolist(), manifest[k]) for x, k in ((er, 'er'), (d, 'd'), (u, 'u'))]
+    keep = [i >= 0 for i in idx]
+    new = [np.flatnonzero(~k) for k in keep]
+    kept = [np.flatnonzero(k) for k in keep]
+    labels = {'rows': hashes, 'er': er.tolist(), 'd': d.tolist(), 'u': u.tolist()}
+
+    # Same layout (entries either reused in place or replaced): update the stored file in place
+    inplace = (manifest is not None and np.load(values_file, mmap_mode='r').shape == shape
+               and all(np.all(i[k] == np.flatnonzero(k)) for i, k in zip(idx, keep)))
+    if inplace:
+        #Entries being recomputed are marked unknown until they are written
+        _write_manifest(manifest_file, terms, e_vac, dtype, model_key,
+                        **{key: [v if k else None for v, k in zip(labels[key], kp)] for key, kp in zip(labels, keep)})
+        out = np.load(values_file, mmap_mode='r+')
+    else:
+        out = np.empty(shape, dtype=dtype)
+        if all(k.any() for k in keep):
+            old = np.load(values_file, mmap_mode='r')
+            out[np.ix_(*keep)] = old[np.ix_(*(i[k] for i, k in zip(idx, keep)))]
+            del old
+
+    every = [np.arange(size) for size in shape[:4]]
+    pieces = [(new[0], every[1], every[2], every[3]), (kept[0], new[1], every[2], every[3]),
+              (kept[0], kept[1], new[2], every[3]), (kept[0], kept[1], kept[2], new[3])]
+    computed = 0
+    for r, e, k, j in pieces:
+        if r.size and e.size and k.size and j.size:
+            rows = {key: np.broadcast_to(np.asarray(v), (n,))[r] for key, v in inputs.items() if key in PER_REACTION}
+            out[np.ix_(r, e, k, j)] = run_sweep(rows, er[e], d[k], u[j], terms, workers=workers,
+                                                chunk_size=chunk_size, e_vac=e_vac, dtype=dtype, jit=jit,
+                                                edl_model=edl_model)
+            computed += r.size * e.size * k.size * j.size
+
+    if inplace:
+        out.flush()
+        del out
+        out = np.load(values_file, mmap_mode='r')
+    else:
+        os.makedirs(store, exist_ok=True)
+        tmp = '%s.%d.tmp.npy' % (values_file[:-4], os.getpid())
+        np.save(tmp, out)
+        os.replace(tmp, values_file)
+    _write_manifest(manifest_file, terms, e_vac, dtype, model_key, **labels)
+    return out, {'rows': new[0], 'er': new[1], 'd': new[2], 'u': new[3],
+                 'fraction': computed / max(int(np.prod(shape[:4])), 1)}
+
+
+def _write_manifest(path, terms, e_vac, dtype, model_key, rows, er, d, u):
+    with open(path + '.tmp', 'w') as fh:
+        json.dump({'model_version': MODEL_VERSION, 'terms': list(terms), 'e_vac': float(e_vac), 'dtype': dtype.name,
+                   'edl_model': model_key, 'rows': rows, 'er': er, 'd': d, 'u': u}, fh)
+    os.replace(path + '.tmp', path)
+
+
+def sweep_dataset(data, er, d, u, terms=('g_2c',), store=None, **kwargs):
+    """
+    Run run_sweep() on a loaded reaction dataset and label the result.
+
+    data is a dict from agcdft.dataset.load_reactions(); extra keyword
+    arguments (workers, chunk_size, out, cache, e_vac, dtype, jit, edl_model) go
+    to run_sweep().
+    With a store folder the sweep runs through incremental_sweep() and
+    attrs['recomputed'] holds the fraction of grid points evaluated; the
+    store replaces out and cache, which then raise TypeError.
+    Returns an EDLResult with axes (reaction, er, d, u, term).
+    """
+    attrs = {'e_vac': kwargs.get('e_vac', E_VAC), 'edl_model': (kwargs.get('edl_model') or Helmholtz()).key()}
+    if store is not None:
+        unsupported = sorted(k for k, v in kwargs.items() if v is not None and v is not False and k not in STORE_KWARGS)
+        if unsupported:
+            raise TypeError("sweep_dataset() with store= does not support %s" % ', '.join(unsupported))
+        kwargs = {k: v for k, v in kwargs.items() if k in STORE_KWARGS}
+        values, changes = incremental_sweep(kernel_inputs(data), er, d, u, store, terms=terms, **kwargs)
+        attrs['recomputed'] = changes['fraction']
+    else:
+        values = run_sweep(kernel_inputs(data), er, d, u, terms=terms, **kwargs)
+    return EDLResult(values, data['M'], np.atleast_1d(er), np.atleast_1d(d), np.atleast_1d(u), terms, attrs=attrs)
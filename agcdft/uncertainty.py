@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo propagation of DFT input uncertainty through Model 2C
+
+Dipole moments, polarizabilities, U_pzc and the V-abs to V-SHE offset
+(vac_nhe, 4.2-4.8 V in the literature) are drawn in batches and pushed
+through the exact Model 2C polynomial of agcdft.kernel.edl_polynomials():
+
+    G_2C(U) = c_2*U^2 + c_1*U + c_0,    beta(U) = dG_2C/dU = 2*c_2*U + c_1
+
+Only the three coefficients are computed per draw, and every batch is folded
+into StreamingStats, so memory stays fixed however many draws are taken.
+
+Spreads are given per input as either a standard deviation (normal draws
+around the nominal value) or a (low, high) tuple of absolute bounds (uniform
+draws), e.g. {'dm_in': 0.02, 'dm_fin': 0.02, 'vac_nhe': (4.2, 4.8)}. A
+vac_nhe draw shifts U_pzc = WF - vac_nhe by vac_nhe_nominal - vac_nhe.
+"""
+
+import numpy as np
+
+from .dataset import kernel_inputs
+from .kernel import E_VAC, VAC_NHE, edl_polynomials
+from .profiling import profiled
+
+UNCERTAIN_INPUTS = ('dm_in', 'dm_fin', 'polar_in', 'polar_fin', 'u_pzc', 'vac_nhe')
+
+
+class StreamingStats:
+    """
+    Mean, standard deviation and percentiles of many samples per element,
+    accumulated batch by batch in fixed memory.
+
+    Mean and variance are merged exactly (Welford/Chan). Percentiles come from
+    a fixed-bin histogram per element whose range is set from the first batch
+    widened by half its spread on each side; they are accurate to one bin
+    width, (range)/bins. Later samples outside the range are counted in
+    under/overflow bins and reported through the 'clipped' fraction.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of one sample, e.g. (R, E, D, U).
+    bins : int
+        Histogram bins per element; memory is prod(shape)*(bins + 2) int64.
+    """
+
+    def __init__(self, shape, bins=2048):
+        self.shape = tuple(shape)
+        self.bins = bins
+        size = int(np.prod(self.shape))
+        self.n = 0
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.counts = np.zeros((size, bins + 2), dtype=np.int64)
+        self.lo = self.width = None
+
+    def update(self, samples):
+        """Add samples of shape (*shape, B)."""
+        x = np.asarray(samples, dtype=float).reshape(self.mean.size, -1)
+        nb = x.shape[1]
+        if nb == 0:
+            return
+
+        # Mean and variance (Chan et al. parallel merge)
+        mb = x.mean(axis=1)
+        m2b = ((x - mb[:, None]) ** 2).sum(axis=1)
+        total = self.n + nb
+        delta = mb - self.mean
+        self.mean += delta * nb / total
+        self.m2 += m2b + delta ** 2 * self.n * nb / total
+        self.n = total
+
+        # Histogram
+        if self.lo is None:
+            xmin, xmax = x.min(axis=1), x.max(axis=1)
+            pad = np.maximum(0.5 * (xmax - xmin), 1e-9 * np.maximum(np.abs(xmax), 1.0))
+            self.lo = xmin - pad
+            self.width = (xmax - xmin + 2 * pad) / self.bins
+        idx = np.floor((x - self.lo[:, None]) / self.width[:, None])
+        idx = np.clip(idx, -1, self.bins).astype(np.int64) + 1
+        flat = idx + (self.bins + 2) * np.arange(x.shape[0])[:, None]
+        self.counts += np.bincount(flat.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / max(self.n - 1, 1)).reshape(self.shape)
+
+    @property
+    def clipped(self):
+        """Fraction of samples that fell outside the histogram range."""
+        return ((self.counts[:, 0] + self.counts[:, -1]) / max(self.n, 1)).reshape(self.shape)
+
+    def percentiles(self, q):
+        """Percentiles q (0-100) interpolated within bins, shape (len(q), *shape)."""
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        under = self.counts[:, 0]
+        cdf = under[:, None] + np.cumsum(self.counts[:, 1:-1], axis=1)
+        out = np.empty((q.size, self.mean.size))
+        rows = np.arange(self.mean.size)
+        for i, p in enumerate(q):
+            target = p / 100 * self.n
+            k = np.minimum((cdf < target).sum(axis=1), self.bins - 1)
+            prev = np.where(k > 0, cdf[rows, k - 1], under)
+            inside = self.counts[rows, k + 1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                frac = np.clip(np.where(inside > 0, (target - prev) / inside, 0.0), 0.0, 1.0)
+            out[i] = self.lo + (k + frac) * self.width
+        return out.reshape((q.size,) + self.shape)
+
+    def summary(self, q=(2.5, 50, 97.5)):
+        return {'mean': self.mean.reshape(self.shape), 'std': self.std, 'q': np.atleast_1d(q),
+                'percentiles': self.percentiles(q), 'clipped': self.clipped}
+
+
+def _draw(rng, nominal, spread, size):
+    """Draws of shape size = (R, B) around per-reaction nominal values."""
+    if isinstance(spread, tuple):
+        low, high = (np.asarray(s, dtype=float).reshape(-1, 1) for s in spread)
+        return rng.uniform(low, high, size)
+    return rng.normal(np.asarray(nominal, dtype=float).reshape(-1, 1),
+                      np.asarray(spread, dtype=float).reshape(-1, 1), size)
+
+
+@profiled('post')
+def propagate_uncertainty(inputs, er, d, u, spread, n_samples=100000, batch_size=10000, q=(2.5, 50, 97.5),
+                          bins=2048, vac_nhe=VAC_NHE, seed=None, e_vac=E_VAC):
+    """
+    Distribution of G_2C and beta from uncertain DFT inputs.
+
+    Parameters
+    ----------
+    inputs : dict
+        Per-reaction keyword arguments of agcdft.edl_terms() (e.g. from
+        agcdft.kernel_inputs()), with the nominal values.
+    er, d, u : array_like
+        Dielectric constants, EDL widths (A) and potentials (V-SHE) at which
+        the distributions are collected.
+    spread : dict
+        Input name (see UNCERTAIN_INPUTS) -> standard deviation or
+        (low, high) bounds, scalar or per reaction. Inputs not listed are
+        held at their nominal values.
+    n_samples, batch_size : int
+        Total draws per reaction and draws evaluated per batch.
+    vac_nhe : float
+        Nominal V-abs to V-SHE offset used for U_pzc in ``inputs``.
+
+    Returns
+    -------
+    dict
+        'g_2c' and 'beta', each a StreamingStats.summary() with arrays of
+        shape (R, E, D, U) ('percentiles' has a leading q axis), plus
+        'n_samples'.
+    """
+    unknown = set(spread) - set(UNCERTAIN_INPUTS)
+    if unknown:
+        raise ValueError("no uncertainty model for %s; choose from %s" % (sorted(unknown), UNCERTAIN_INPUTS))
+    n = np.broadcast(*(np.atleast_1d(v) for v in inputs.values())).size
+    nominal = {k: np.broadcast_to(np.asarray(v), (n,)) for k, v in inputs.items()}
+    u = np.atleast_1d(np.asarray(u, dtype=float))
+    shape = (n, np.size(er), np.size(d), u.size)
+    rng = np.random.default_rng(seed)
+    stats = {'g_2c': StreamingStats(shape, bins), 'beta': StreamingStats(shape, bins)}
+
+    done = 0
+    while done < n_samples:
+        b = min(batch_size, n_samples - done)
+        draws = {k: np.repeat(v[:, None], b, axis=1) for k, v in nominal.items()}
+        for k, s in sorted(spread.items(), key=lambda i: i[0] == 'vac_nhe'): #vac_nhe shifts the drawn U_pzc
+            if k == 'vac_nhe':
+                draws['u_pzc'] = draws['u_pzc'] + vac_nhe - _draw(rng, vac_nhe, s, (n, b))
+            else:
+                draws[k] = _draw(rng, nominal[k], s, (n, b))
+        poly = edl_polynomials(er=er, d=d, e_vac=e_vac, reference='she',
+                               **{k: v.ravel() for k, v in draws.items()})['2c']
+        # (R*B, E, D, 3) -> coefficients of shape (R, B, E, D, 1), broadcast against U
+        poly = poly.reshape((n, b) + poly.shape[1:])[..., None]
+        c2, c1, c0 = poly[..., 0, :], poly[..., 1, :], poly[..., 2, :]
+        # Samples on the last axis: (R, E, D, U, B)
+        stats['g_2c'].update(np.moveaxis((c2 * u + c1) * u + c0, 1, -1))
+        stats['beta'].update(np.moveaxis(2 * c2 * u + c1, 1, -1))
+        done += b
+
+    out = {k: s.summary(q) for k, s in stats.items()}
+    out['n_samples'] = done
+    return out
+
+
+def propagate_dataset(data, er, d, u, spread, **kwargs):
+    """propagate_uncertainty() for every reaction of a dataset from agcdft.load_reactions()."""
+    return propagate_uncertainty(kernel_inputs(data), er, d, u, spread, **kwargs)
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the agcdft loaders, kernel, beta averaging, root finding and plotting
+
+Synthetic reaction sheets of increasing size are generated and every stage is
+timed (best of --repeat runs) with its peak traced memory (tracemalloc, one
+extra run per stage):
+
+    load         pd.read_excel/read_csv of the sheet (load_reactions, no cache)
+    load_cached  load_reactions from its binary .npz copy
+    kernel       run_sweep of G_2C over the (reaction, er, d, U) grid
+    beta         beta_coefficients + beta_average over (reaction, er, d)
+    onset        onset_potentials (closed-form roots of G_2C = 0)
+    plot         G_2C curves and beta heatmap of one reaction, saved as png
+
+Stages whose arrays would exceed --max-elements are skipped and reported as
+such. --check recomputes the numbers the bundled scripts produce for
+NH* -> NH2* on Rh(111) (Barrier_EDL_Base.py) and CO on Cu(111)/(100)
+(sensitivityEDL.py), stored in reference.json, compares the other kernel
+paths with the float64 sweep on the Cu(111) grid, and fails on any mismatch:
+
+    jit        numba loop of edl_terms_into(), every term (skipped without numba)
+    float32    G_2C within FLOAT32_ERROR times the summed |term| magnitudes
+    gcs        Gouy-Chapman-Stern G_2C tends to Helmholtz as the diffuse layer
+               vanishes (1e10 mol/L, within 1e-4 eV), and its capacitance is
+               the derivative of its charge (0.1 mol/L)
+    table      a constant tabulated curve C = er*e_vac/d reproduces Helmholtz
+    cache      editing a curve file under the same path invalidates cached rows
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 10,1000 --grids 10x10x100 --repeat 5 --out bench.json
+    python benchmarks/run_benchmarks.py --check --sizes ''
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.append(ROOT)
+from agcdft import (FLOAT32_ERROR, GouyChapmanStern, ResultCache, TabulatedCapacitance, beta_average, beta_coefficients, edl_terms, kernel_inputs, load_reactions,
+                    onset_potentials, reaction_deltas, run_sweep, sweep_dataset)
+from agcdft.kernel import E_VAC
+from agcdft.sweep import TERMS
+
+DEFAULT_SIZES = '10,100,1000,10000,100000,1000000'
+DEFAULT_GRIDS = '10x10x100,100x100x1000'
+STAGES = ('load', 'load_cached', 'kernel', 'beta', 'onset', 'plot')
+XLSX_LIMIT = 10000 #Larger sheets are written as CSV, openpyxl takes minutes beyond this
+
+
+def synthetic_dataset(n, seed=0):
+    """Reaction sheet of n random reactions in the layout of load_reactions()."""
+    rng = np.random.default_rng(seed)
+    e_in = rng.normal(-250, 50, n)
+    dm_in = rng.normal(0, 0.3, n)
+    polar_in = 4.5 + rng.uniform(0, 2, n)
+    return {
+        'M': np.array(['R%d' % i for i in range(n)]),
+        'E_In': e_in,
+        'DM_In': dm_in,
+        'Polar_In': polar_in,
+        'G_Solv': rng.normal(0, 0.05, n),
+        'E_Fin': e_in + rng.normal(0.5, 0.5, n),
+        'DM_Fin': dm_in + rng.normal(0, 0.3, n),
+        'Polar_Fin': polar_in + rng.normal(0, 0.5, n),
+        'Polar_Bare': np.full(n, 4.5),
+        'Area': np.full(n, 50.79),
+        'Upzc': np.full(n, 0.29),
+        'Faradaic': rng.uniform(size=n) < 0.9,
+    }
+
+
+def write_sheet(data, folder):
+    """Write a synthetic sheet as .xlsx (small) or .csv (large); returns the path."""
+    import pandas as pd
+
+    df = pd.DataFrame({k: v for k, v in data.items()})
+    if len(df) <= XLSX_LIMIT:
+        try:
+            import openpyxl # noqa: F401
+            path = os.path.join(folder, 'synthetic_%d.xlsx' % len(df))
+            df.to_excel(path, index=False)
+            return path
+        except ImportError:
+            pass
+    path = os.path.join(folder, 'synthetic_%d.csv' % len(df))
+    df.to_csv(path, index=False)
+    return path
+
+
+def parse_grid(spec):
+    """'ExDxU' -> (er, d, U) grids spanning the ranges of the scripts."""
+    n_er, n_d, n_u = (int(x) for x in spec.lower().split('x'))
+    return np.linspace(1, 78.4, n_er), np.linspace(3, 10, n_d), np.linspace(-2.5, 1, n_u)
+
+
+def measure(func, repeat, memory=True):
+    """Best and mean wall time of repeat calls, plus the peak traced memory of one more."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    out = {'seconds': min(times), 'mean': float(np.mean(times))}
+    if memory:
+        tracemalloc.start()
+        func()
+        out['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return out
+
+
+def _plot(result, beta, er, d, folder):
+    from agcdft.plotting import beta_heatmap, plot_g_2c, render_figures
+    return render_figures([('g_2c', plot_g_2c, {'result': result, 'reaction': result.coords['reaction'][0]}),
+                           ('beta', beta_heatmap, {'beta': beta, 'er_values': er, 'd_values': d})], folder, workers=1)
+
+
+def bench_case(n, grid, args, folder):
+    """Time every stage for n synthetic reactions on one grid; returns a list of records."""
+    er, d, u = parse_grid(grid)
+    data = synthetic_dataset(n, args.seed)
+    inputs = kernel_inputs(data)
+    records = []
+
+    def record(stage, elements, func):
+        rec = {'reactions': n, 'grid': grid, 'stage': stage}
+        if stage not in args.stages:
+            return
+        if elements > args.max_elements:
+            rec['skipped'] = '%.1e elements > --max-elements' % elements
+        else:
+            rec.update(measure(func, args.repeat, not args.no_memory))
+        records.append(rec)
+        if not args.quiet:
+            print(_format(rec), flush=True)
+
+    if {'load', 'load_cached'} & set(args.stages):
+        path = write_sheet(data, folder)
+        cache = os.path.join(folder, 'cache')
+        record('load', n, lambda: load_reactions(path, use_cache=False))
+        load_reactions(path, cache_dir=cache)
+        record('load_cached', n, lambda: load_reactions(path, cache_dir=cache))
+        os.remove(path)
+
+    record('kernel', n * er.size * d.size * u.size,
+           lambda: run_sweep(inputs, er, d, u, terms=('g_2c',), workers=args.workers))
+
+    deltas = reaction_deltas(inputs['dm_in'], inputs['dm_fin'], inputs['polar_in'], inputs['polar_fin'])
+
+    def beta():
+        coeffs = beta_coefficients(deltas['diff_dm'], deltas['diff_polar'], deltas['diff_a_dm'], er, d,
+                                   inputs['area'], faradaic=inputs['faradaic'])
+        return beta_average(coeffs, u[0], u[-1], inputs['u_pzc'])
+    record('beta', n * er.size * d.size, beta)
+    record('onset', n * er.size * d.size, lambda: onset_potentials(er=er, d=d, **inputs))
+
+    if 'plot' in args.stages:
+        # One reaction on at most the 6 x 4 (er, d) subset the scripts plot
+        er_p, d_p = er[np.linspace(0, er.size - 1, min(6, er.size)).astype(int)], d[np.linspace(0, d.size - 1, min(4, d.size)).astype(int)]
+        one = {k: v[:1] for k, v in data.items()}
+        result = sweep_dataset(one, er_p, d_p, u, workers=1)
+        coeffs = beta_coefficients(deltas['diff_dm'][:1], deltas['diff_polar'][:1], deltas['diff_a_dm'][:1], er_p, d_p,
+                                   inputs['area'][:1], faradaic=inputs['faradaic'][:1])
+        beta_p = beta_average(coeffs, u[0], u[-1], inputs['u_pzc'][:1])[0]
+        record('plot', 0, lambda: _plot(result, beta_p, er_p, d_p, os.path.join(folder, 'figures')))
+    return records
+
+
+def check_reference(path=os.path.join(HERE, 'reference.json'), atol=1e-8):
+    """Recompute the bundled-script numbers in reference.json; returns (name, max error, passed) rows."""
+    with open(path) as fh:
+        ref = json.load(fh)
+    rows = []
+
+    nh = ref['nh_rh111']
+    terms = edl_terms(u=np.array(nh['u']), **nh['inputs'])
+    for key in ('g_1b', 'g_2a', 'g_2b', 'g_2c'):
+        err = float(np.max(np.abs(np.ravel(terms[key]) - nh[key])))
+        rows.append(('NH*->NH2* Rh(111) ' + key, err, err <= atol))
+
+    for name in ('co_cu111', 'co_cu100'):
+        co = ref[name]
+        data = load_reactions(os.path.join(ROOT, co['workbook']), co['sheet'])
+        data['Faradaic'] = np.array(co['faradaic'])
+        g = sweep_dataset(data, co['er'], co['d'], co['u'], workers=1).values[..., 0]
+        err = float(np.max(np.abs(g - co['g_2c'])))
+        rows.append(('CO Cu(%s) g_2c' % co['sheet'][:3], err, err <= atol))
+
+        inputs = kernel_inputs(data)
+        deltas = reaction_deltas(inputs['dm_in'], inputs['dm_fin'], inputs['polar_in'], inputs['polar_fin'])
+        coeffs = beta_coefficients(deltas['diff_dm'], deltas['diff_polar'], deltas['diff_a_dm'], co['er'], co['d'],
+                                   data['Area'][0], faradaic=data['Faradaic'])
+        beta = beta_average(coeffs, co['u_window'][0], co['u_window'][1], data['Upzc'][0])
+        err = float(np.max(np.abs(beta - co['beta_avg'])))
+        rows.append(('CO Cu(%s) beta_avg' % co['sheet'][:3], err, err <= atol))
+        if name == 'co_cu111':
+            rows.extend(check_paths(data, co['er'], co['d'], co['u'], atol))
+    return rows
+
+
+def check_paths(data, er, d, u, atol=1e-8):
+    """Compare the jit and float32 kernel paths with the float64 sweep; returns check rows (NaN error: skipped)."""
+    rows = []
+    full = sweep_dataset(data, er, d, u, terms=TERMS, workers=1).values
+
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        rows.append(('jit (numba not installed)', float('nan'), True))
+    else:
+        err = float(np.max(np.abs(sweep_dataset(data, er, d, u, terms=TERMS, workers=1, jit=True).values - full)))
+        rows.append(('jit all terms', err, err <= atol))
+
+    # The float32 bound is relative to the summed magnitudes of G_1A, |e|U' and the three EDL terms
+    g_2c = full[..., TERMS.index('g_2c')]
+    faradaic_u = full[..., TERMS.index('g_1b')] - full[..., TERMS.index('g_1a')]
+    magnitude = np.abs(full[..., TERMS.index('g_1a')]) + np.abs(faradaic_u) + sum(
+        np.abs(full[..., TERMS.index(t)]) for t in ('c_total', 'dm_total', 'p_total'))
+    single = sweep_dataset(data, er, d, u, workers=1, dtype=np.float32).values[..., 0]
+    err = float(np.max(np.abs(single - g_2c)))
+    rows.append(('float32 g_2c', err, bool(np.all(np.abs(single - g_2c) <= FLOAT32_ERROR * magnitude))))
+    rows.extend(check_edl_models(data, er, d, u, g_2c, atol))
+    return rows
+
+
+def check_edl_models(data, er, d, u, g_2c, atol=1e-8):
+    """Compare the EDL models with the Helmholtz G_2C on the same grid and check the model cache keys."""
+    rows = []
+    gcs = sweep_dataset(data, er, d, u, workers=1, edl_model=GouyChapmanStern(1e10)).values[..., 0]
+    err = float(np.max(np.abs(gcs - g_2c)))
+    rows.append(('gcs 1e10 mol/L vs helmholtz', err, err <= 1e-4))
+
+    u_prime, step = np.linspace(-2, 2, 41), 1e-5
+    gcs = GouyChapmanStern(0.1)
+    sigma_low, sigma_high = (gcs.table(er, d, u_prime + h)[0] for h in (-step, step))
+    cap = gcs.table(er, d, u_prime)[1]
+    err = float(np.max(np.abs((sigma_high - sigma_low) / (2 * step) - cap) / cap))
+    rows.append(('gcs 0.1 mol/L dsigma/dU\' = C', err, err <= 1e-6))
+
+    err = 0.0
+    for j, er_val in enumerate(er):
+        for k, d_val in enumerate(d):
+            curve = TabulatedCapacitance([-5, 5], [er_val * E_VAC / d_val] * 2, units='atomic')
+            table = sweep_dataset(data, [er_val], [d_val], u, workers=1, edl_model=curve).values[:, 0, 0, :, 0]
+            err = max(err, float(np.max(np.abs(table - g_2c[:, j, k]))))
+    rows.append(('table constant vs helmholtz', err, err <= atol))
+
+    # Same file name, new contents: the second sweep must not reuse the first curve's rows
+    folder = tempfile.mkdtemp(prefix='agcdft_check_')
+    try:
+        path = os.path.join(folder, 'curve.csv')
+        cache = ResultCache(os.path.join(folder, 'sweeps'))
+        for c in (20, 80):
+            with open(path, 'w') as fh:
+                fh.write('U_prime,C\n-2,%d\n2,%d\n' % (c, c))
+            cached = sweep_dataset(data, er, d, u, workers=1, cache=cache,
+                                   edl_model=TabulatedCapacitance.from_csv(path)).values
+        fresh = sweep_dataset(data, er, d, u, workers=1, edl_model=TabulatedCapacitance.from_csv(path)).values
+        err = float(np.max(np.abs(cached - fresh)))
+        rows.append(('cache edited curve file', err, err <= atol))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return rows
+
+
+def _format(rec):
+    head = '%9d  %-15s %-12s' % (rec['reactions'], rec['grid'], rec['stage'])
+    if 'skipped' in rec:
+        return head + 'skipped (%s)' % rec['skipped']
+    mem = '  peak %9.1f MB' % rec['peak_mb'] if 'peak_mb' in rec else ''
+    return head + '%10.4f s%s' % (rec['seconds'], mem)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Benchmark the agcdft stages on synthetic reaction sheets')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='reaction counts (default %s)' % DEFAULT_SIZES)
+    parser.add_argument('--grids', default=DEFAULT_GRIDS, help='er x d x U grid sizes (default %s)' % DEFAULT_GRIDS)
+    parser.add_argument('--stages', default=','.join(STAGES), help='stages to run (default all)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage, the best is reported')
+    parser.add_argument('--max-elements', type=float, default=1e7,
+                        help='skip stages with more grid points (default 1e7; onset peaks near 1.4 GB there)')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='worker processes of the kernel sweep')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run of every stage')
+    parser.add_argument('--check', action='store_true', help='also check the bundled-script reference numbers')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write the records as JSON')
+    parser.add_argument('-q', '--quiet', action='store_true')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        raise SystemExit('unknown stages %s, choose from %s' % (sorted(unknown), STAGES))
+    import matplotlib
+    matplotlib.use('Agg')
+
+    records = []
+    folder = tempfile.mkdtemp(prefix='agcdft_bench_')
+    try:
+        for n in (int(float(s)) for s in args.sizes.split(',') if s.strip()):
+            for grid in (g.strip() for g in args.grids.split(',') if g.strip()):
+                records.extend(bench_case(n, grid, args, folder))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    checks = check_reference() if args.check else []
+    for name, err, ok in checks:
+        if np.isnan(err):
+            print('%-28s skipped' % name)
+        else:
+            print('%-28s max |error| %.2e  %s' % (name, err, 'ok' if ok else 'FAILED'))
+
+    if args.out:
+        with open(args.out, 'w') as fh:
+            json.dump({'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                                   'numpy': np.__version__, 'cpus': os.cpu_count()},
+                       'records': records,
+                       'checks': [{'name': name, 'max_error': err, 'passed': ok} for name, err, ok in checks]},
+                      fh, indent=1)
+    return 0 if all(ok for _, _, ok in checks) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())